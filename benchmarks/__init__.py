@@ -0,0 +1,6 @@
+"""
+Benchmarks of the authorization hot path.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.indexes --rows 1000000
+"""
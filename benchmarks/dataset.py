@@ -0,0 +1,87 @@
+import random
+import typing as t
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from .models import User, Role, Permission, Project, UserRole, RolePermission
+
+
+class Dataset(t.NamedTuple):
+    users: int
+    projects: int
+    roles_per_project: int
+    roles_per_user: int
+    permissions: int
+    permissions_per_role: int
+
+    @property
+    def roles(self) -> int:
+        return self.projects * self.roles_per_project
+
+
+def _insert(session: Session, model: type, rows: t.Iterable[dict], batch=50000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch:
+            session.execute(insert(model), chunk)
+            chunk = []
+    if chunk:
+        session.execute(insert(model), chunk)
+
+
+def populate(session: Session, dataset: Dataset, seed: int = 0) -> None:
+    """
+    Fills the RBAC tables with a synthetic dataset. IDs are dense and start at
+    1: role `r` of project `p` (both from 0) has ID `p * roles_per_project + r + 1`
+    and is named `role-r`, projects are named `project-p`, permissions
+    `permission-n`. Every user gets `roles_per_user` random roles.
+    """
+    rng = random.Random(seed)
+    _insert(
+        session,
+        Project,
+        ({"fsr_project_name": f"project-{p}"} for p in range(dataset.projects)),
+    )
+    _insert(
+        session,
+        Role,
+        (
+            {"fsr_role_name": f"role-{r}", "fsr_project_id": p + 1}
+            for p in range(dataset.projects)
+            for r in range(dataset.roles_per_project)
+        ),
+    )
+    _insert(
+        session,
+        Permission,
+        (
+            {"fsr_permission_name": f"permission-{n}"}
+            for n in range(dataset.permissions)
+        ),
+    )
+    _insert(
+        session,
+        RolePermission,
+        (
+            {"fsr_role_id": role, "fsr_permission_id": permission + 1}
+            for role in range(1, dataset.roles + 1)
+            for permission in rng.sample(
+                range(dataset.permissions),
+                min(dataset.permissions_per_role, dataset.permissions),
+            )
+        ),
+    )
+    _insert(session, User, ({"fsr_user_id": u} for u in range(1, dataset.users + 1)))
+    _insert(
+        session,
+        UserRole,
+        (
+            {"fsr_user_id": user, "fsr_role_id": role}
+            for user in range(1, dataset.users + 1)
+            for role in rng.sample(
+                range(1, dataset.roles + 1),
+                min(dataset.roles_per_user, dataset.roles),
+            )
+        ),
+    )
+    session.commit()
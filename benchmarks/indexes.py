@@ -0,0 +1,134 @@
+"""
+Query plans and latencies of the RBAC access paths with and without the
+secondary indexes declared by the mixins.
+
+    python -m benchmarks.indexes --rows 1000000
+
+The UserRole table is filled with `--rows` rows in a file backed SQLite
+database. Every access path is measured with the indexes, then again after
+dropping them. Each timed run follows `--warm-up` untimed queries, so that the
+first run does not pay for the cold page cache alone.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import bindparam, create_engine, select, text
+from sqlalchemy.orm import Session
+from .dataset import Dataset, populate
+from .models import db, Project, Role, UserRole, RolePermission
+
+INDEXES = [
+    "ix_UserRole_fsr_user_id",
+    "ix_Role_fsr_project_id",
+    "ix_RolePermission_fsr_permission_id",
+]
+
+
+def access_paths(users, projects, permissions):
+    return {
+        "user_roles": (
+            select(Project.fsr_project_name, Role.fsr_role_name)
+            .select_from(UserRole)
+            .join(Role, UserRole.fsr_role_id == Role.fsr_role_id)
+            .join(Project, Role.fsr_project_id == Project.fsr_project_id)
+            .where(UserRole.fsr_user_id == bindparam("user_id")),
+            lambda: {"user_id": random.randint(1, users)},
+        ),
+        "project_roles": (
+            select(Role.fsr_role_name).where(
+                Role.fsr_project_id == bindparam("project_id")
+            ),
+            lambda: {"project_id": random.randint(1, projects)},
+        ),
+        "permission_roles": (
+            select(RolePermission.fsr_role_id).where(
+                RolePermission.fsr_permission_id == bindparam("permission_id")
+            ),
+            lambda: {"permission_id": random.randint(1, permissions)},
+        ),
+    }
+
+
+def measure(session, paths, iterations, warm_up):
+    results = {}
+    for name, (stmt, params) in paths.items():
+        compiled = stmt.params(**params()).compile(
+            session.get_bind(), compile_kwargs={"literal_binds": True}
+        )
+        plan = session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+        for _ in range(warm_up):
+            session.execute(stmt, params()).fetchall()
+        timings = []
+        for _ in range(iterations):
+            values = params()
+            start = time.perf_counter()
+            session.execute(stmt, values).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {
+            "plan": [row[-1] for row in plan],
+            "mean_ms": statistics.fmean(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p99_ms": timings[int(len(timings) * 0.99) - 1],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--roles-per-user", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--roles-per-project", type=int, default=20)
+    parser.add_argument("--permissions", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warm-up", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        db.metadata.create_all(engine)
+        dataset = Dataset(
+            users=args.rows // args.roles_per_user,
+            projects=args.projects,
+            roles_per_project=args.roles_per_project,
+            roles_per_user=args.roles_per_user,
+            permissions=args.permissions,
+            permissions_per_role=5,
+        )
+        with Session(engine) as session:
+            populate(session, dataset, seed=args.seed)
+            session.execute(text("ANALYZE"))
+            paths = access_paths(dataset.users, args.projects, args.permissions)
+            after = measure(session, paths, args.iterations, args.warm_up)
+            for index in INDEXES:
+                session.execute(text(f'DROP INDEX "{index}"'))
+            session.execute(text("ANALYZE"))
+            before = measure(session, paths, args.iterations, args.warm_up)
+        engine.dispose()
+
+    results = {"rows": args.rows, "without_indexes": before, "with_indexes": after}
+    for name in paths:
+        print(name)
+        for label, result in (("without", before), ("with", after)):
+            print(
+                f"  {label:>7} indexes: mean {result[name]['mean_ms']:.3f} ms, "
+                f"p99 {result[name]['p99_ms']:.3f} ms"
+            )
+            for step in result[name]["plan"]:
+                print(f"      {step}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Latency and SQL query count of the authorization hot path.
+
+    python -m benchmarks.run --users 1000 --roles-per-user 10 --output results.json
+
+Every decorator is measured through the Flask test client, with the user loaded
+from the database at the start of each request as an application would.
+`UserMixin.roles`/`projects` and `RoleMixin.has_permission` are measured on a
+cold session. Results are printed and optionally written as JSON, so that runs
+of two releases can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import typing as t
+from importlib.metadata import version
+from flask import Flask, request
+from sqlalchemy import event
+import flask_secure_roles
+from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles import policy
+from .dataset import Dataset, populate
+from .models import db, User, Role
+
+
+def create_app(uri: str, config: t.Dict[str, t.Any]) -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config.update(config)
+    db.init_app(app)
+    fsr = FlaskSecureRoles(app)
+
+    @fsr.guest_user_loader
+    def guest_loader():
+        return db.session.get(User, 1)
+
+    @app.before_request
+    def load_user():
+        fsr.user_loader(db.session.get(User, int(request.headers["X-User"])))
+
+    @app.route("/required_roles")
+    @fsr.required_roles("project-0", ["role-0", "role-1"])
+    def required_roles():
+        return "ok"
+
+    @app.route("/any_role")
+    @fsr.any_role("project-0", ["role-0", "role-1"])
+    def any_role():
+        return "ok"
+
+    @app.route("/forbid_roles")
+    @fsr.forbid_roles("project-0", ["role-0"])
+    def forbid_roles():
+        return "ok"
+
+    @app.route("/stacked")
+    @fsr.forbid_roles("project-0", ["role-2"])
+    @fsr.any_role("project-0", ["role-0", "role-1"])
+    @fsr.required_roles("project-0", ["role-0"])
+    def stacked():
+        return "ok"
+
+    @app.route("/policy")
+    @fsr.policy(
+        (policy.Role("project-0", "role-0") | policy.Role("project-0", "role-1"))
+        & ~policy.Role("project-1", "role-0")
+    )
+    def policy_route():
+        return "ok"
+
+    @app.route("/required_permissions")
+    @fsr.required_permissions("project-0", ["permission-0"])
+    def required_permissions():
+        return "ok"
+
+    @app.route("/any_permission")
+    @fsr.any_permission("project-0", ["permission-0", "permission-1"])
+    def any_permission():
+        return "ok"
+
+    return app
+
+
+class QueryCounter:
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self)
+
+
+def summarize(timings: t.List[float], queries: int) -> t.Dict[str, float]:
+    timings = sorted(timings)
+
+    def percentile(p: float) -> float:
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    return {
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "queries": queries / len(timings),
+    }
+
+
+def bench_routes(
+    app: Flask, engine, dataset: Dataset, iterations: int, rng: random.Random
+):
+    # Runs outside of an app context so that every request gets its own,
+    # with a fresh session, as in production
+    results = {}
+    client = app.test_client()
+    routes = [
+        rule.rule
+        for rule in app.url_map.iter_rules()
+        if rule.rule != "/static/<path:filename>"
+    ]
+    for route in routes:
+        timings = []
+        with QueryCounter(engine) as counter:
+            for _ in range(iterations):
+                headers = {"X-User": str(rng.randint(1, dataset.users))}
+                start = time.perf_counter()
+                client.get(route, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+        results[f"decorator:{route.lstrip('/')}"] = summarize(timings, counter.count)
+    return results
+
+
+def bench_mixins(dataset: Dataset, iterations: int, rng: random.Random):
+    results = {}
+    engine = db.engine
+    calls = {
+        "UserMixin.roles": lambda user, role: user.roles(project_name="project-0"),
+        "UserMixin.roles(eager)": lambda user, role: user.roles(
+            project_name="project-0", eager=True
+        ),
+        "UserMixin.projects": lambda user, role: user.projects(),
+        "UserMixin.projects(eager)": lambda user, role: user.projects(eager=True),
+        "RoleMixin.has_permission": lambda user, role: role.has_permission(
+            "project-0", "permission-0"
+        ),
+    }
+    for name, call in calls.items():
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            db.session.expire_all()
+            user = db.session.get(User, rng.randint(1, dataset.users))
+            role = db.session.get(Role, rng.randint(1, dataset.roles_per_project))
+            with QueryCounter(engine) as counter:
+                start = time.perf_counter()
+                call(user, role)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries += counter.count
+        results[name] = summarize(timings, queries)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--roles-per-project", type=int, default=20)
+    parser.add_argument("--roles-per-user", type=int, default=10)
+    parser.add_argument("--permissions", type=int, default=100)
+    parser.add_argument("--permissions-per-role", type=int, default=10)
+    parser.add_argument("--database", choices=["memory", "file"], default="memory")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--config",
+        action="append",
+        default=[],
+        metavar="KEY=JSON",
+        help="Extension config, e.g. FSR_CACHE=true. May be repeated.",
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    dataset = Dataset(
+        users=args.users,
+        projects=args.projects,
+        roles_per_project=args.roles_per_project,
+        roles_per_user=args.roles_per_user,
+        permissions=args.permissions,
+        permissions_per_role=args.permissions_per_role,
+    )
+    config = {}
+    for item in args.config:
+        key, _, value = item.partition("=")
+        config[key] = json.loads(value)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.database == "file":
+            uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        else:
+            uri = "sqlite:///:memory:"
+        app = create_app(uri, config)
+        with app.app_context():
+            db.create_all()
+            populate(db.session, dataset, seed=args.seed)
+            engine = db.engine
+        results = bench_routes(app, engine, dataset, args.iterations, rng)
+        with app.app_context():
+            results.update(bench_mixins(dataset, args.iterations, rng))
+            db.session.remove()
+        engine.dispose()
+
+    report = {
+        "meta": {
+            "flask_secure_roles": flask_secure_roles.__version__,
+            "flask": version("flask"),
+            "sqlalchemy": version("sqlalchemy"),
+            "python": platform.python_version(),
+            "database": args.database,
+            "iterations": args.iterations,
+            "seed": args.seed,
+            "dataset": dataset._asdict(),
+            "config": config,
+        },
+        "results": results,
+    }
+    for name, result in results.items():
+        print(
+            f"{name:<36} mean {result['mean_ms']:8.3f} ms  "
+            f"p99 {result['p99_ms']:8.3f} ms  queries {result['queries']:6.2f}"
+        )
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ setup(
     zip_safe=False,
     install_requires=[
         "Flask>=2.0.0",
+        "blinker>=1.6",
         "flask_sqlalchemy==3.1.1",
         "SQLAlchemy==2.0.22",
     ],
@@ -1,5 +1,7 @@
 from .models import *
 from .core import current_user, FlaskSecureRoles
+from .principal import Principal
+from .snapshot import Snapshot
 
 __version__ = "0.1.0"
 
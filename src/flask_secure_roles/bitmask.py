@@ -0,0 +1,38 @@
+import threading
+import typing as t
+
+
+class RoleBits:
+    """
+    Maps role names to dense integer ids per project, so that a set of roles
+    of a project can be represented by an integer bitmask.
+
+    Ids are assigned on first sight and never change, which makes the masks
+    compiled by the decorators at decoration time valid for the whole process.
+    """
+
+    def __init__(self) -> None:
+        self._ids: t.Dict[str, t.Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _bit(self, project: str, role: str) -> int:
+        ids = self._ids.get(project)
+        if ids is None or role not in ids:
+            with self._lock:
+                ids = self._ids.setdefault(project, {})
+                ids.setdefault(role, len(ids))
+        return 1 << ids[role]
+
+    def mask(self, project: str, roles: t.Iterable[str]) -> int:
+        """
+        Bitmask of `roles` within `project`
+
+        :param project: Project name
+        :param roles: Role names
+        :return: Integer with the bit of every role set
+        :rtype: int
+        """
+        mask = 0
+        for role in roles:
+            mask |= self._bit(project, role)
+        return mask
@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+import typing as t
+import weakref
+from collections import OrderedDict
+from .snapshot import Snapshot
+
+__all__ = ["CacheBackend", "MemoryCache", "RedisCache"]
+
+
+class CacheBackend:
+    """
+    Interface of the stores used to keep authorization data across requests.
+
+    Every entry is bound to the generation that was current when it was written.
+    Bumping the generation invalidates all the entries at once, which is how
+    changes to the authorization models reach every worker sharing the store.
+    """
+
+    def get(self, key: str) -> t.Any:
+        """
+        Returns the value stored for `key`, or `None` if it is missing, expired
+        or was written in an older generation
+        """
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: t.Sequence[str]) -> t.List[t.Any]:
+        """
+        Returns the values stored for `keys`, in order, with `None` for misses
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: t.Any, generation: t.Optional[int] = None) -> None:
+        """
+        Stores `value` for `key`
+
+        :param generation: Generation the value was computed in. Pass the
+            generation read before computing the value, so that a bump happening
+            meanwhile invalidates it. Defaults to the current generation.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        """
+        Current generation of the store
+        """
+        raise NotImplementedError
+
+    def bump_generation(self) -> int:
+        """
+        Invalidates every entry by moving to a new generation
+
+        :return: The new generation
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        self.bump_generation()
+
+
+class MemoryCache(CacheBackend):
+    """
+    Process wide LRU cache with a time to live.
+
+    :param maxsize: Maximum number of entries kept, the least recently used
+        entry is evicted first.
+    :param ttl: Seconds after which an entry expires. `None` disables expiry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: t.Optional[float] = 300.0) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._generation = 0
+        self._entries: "OrderedDict[str, t.Tuple[float, int, t.Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: t.Sequence[str]) -> t.List[t.Any]:
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    values.append(None)
+                    continue
+                expires, generation, value = entry
+                if expires < now or generation != self._generation:
+                    del self._entries[key]
+                    values.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                values.append(value)
+        return values
+
+    def set(self, key: str, value: t.Any, generation: t.Optional[int] = None) -> None:
+        expires = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is None:
+                generation = self._generation
+            self._entries[key] = (expires, generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> int:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            return self._generation
+
+
+def _dump_index(index: t.Mapping[t.Optional[str], t.FrozenSet[str]]) -> str:
+    # Pairs, as global roles have no project name to use as a key
+    return json.dumps(
+        [[key, sorted(values)] for key, values in index.items()],
+        separators=(",", ":"),
+    )
+
+
+def _load_index(data: str) -> Snapshot:
+    items = json.loads(data)
+    if isinstance(items, dict):
+        # Written by an earlier release
+        items = items.items()
+    return Snapshot(dict(items))
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by every worker through a Redis server.
+
+    The generation lives in its own key and is fetched with the entries in a
+    single `MGET`, so a bump is seen by every worker on its next read.
+
+    :param client: A client implementing the `redis.Redis` API
+        (`mget`, `set`, `delete`, `get` and `incr`).
+    :param prefix: Prefix of every key written by the cache.
+    :param ttl: Seconds after which an entry expires. `None` disables expiry.
+    :param dumps: Serializes a value to a string.
+    :param loads: Deserializes a string written by `dumps`.
+    """
+
+    def __init__(
+        self,
+        client: t.Any,
+        prefix: str = "fsr:",
+        ttl: t.Optional[float] = 300.0,
+        dumps: t.Callable[[t.Any], str] = _dump_index,
+        loads: t.Callable[[str], t.Any] = _load_index,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+        self._generation_key = f"{prefix}generation"
+
+    def get_many(self, keys: t.Sequence[str]) -> t.List[t.Any]:
+        raw_generation, *raw_values = self.client.mget(
+            [self._generation_key, *(self.prefix + key for key in keys)]
+        )
+        generation = _decode(raw_generation) or "0"
+        values = []
+        for raw in raw_values:
+            if raw is None:
+                values.append(None)
+                continue
+            entry_generation, _, data = _decode(raw).partition(":")
+            values.append(self.loads(data) if entry_generation == generation else None)
+        return values
+
+    def set(self, key: str, value: t.Any, generation: t.Optional[int] = None) -> None:
+        if generation is None:
+            generation = self.generation()
+        ex = None if self.ttl is None else max(1, int(self.ttl))
+        self.client.set(self.prefix + key, f"{generation}:{self.dumps(value)}", ex=ex)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def generation(self) -> int:
+        return int(_decode(self.client.get(self._generation_key)) or 0)
+
+    def bump_generation(self) -> int:
+        return int(self.client.incr(self._generation_key))
+
+
+def _decode(value: t.Union[bytes, str, None]) -> t.Union[str, None]:
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+# Objects notified about changes to the authorization models. They must
+# implement `_invalidate(user_ids)`, where `None` means every user.
+_subscribers: "weakref.WeakSet[t.Any]" = weakref.WeakSet()
+
+
+def subscribe(subscriber: t.Any) -> None:
+    """
+    Registers `subscriber` to be invalidated whenever a model derived from one
+    of the authorization mixins is inserted, updated or deleted.
+    """
+    _subscribers.add(subscriber)
+
+
+def _notify(user_ids: t.Optional[t.Set[str]]) -> None:
+    for subscriber in list(_subscribers):
+        subscriber._invalidate(user_ids)
@@ -0,0 +1,90 @@
+import typing as t
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session, scoped_session
+from .cache import _notify
+from .models import (
+    PermissionMixin,
+    ProjectMixin,
+    RoleMixin,
+    RolePermissionMixin,
+    UserRoleMixin,
+)
+from .versions import EVERYONE, record
+
+# Key of the scopes changed by a flush in `Session.info`. A scope is a user
+# ID, or `EVERYONE` for a change affecting every user.
+_PENDING = "fsr_rbac_changes"
+# Key of the scopes changed in the current transaction. They are dropped again
+# after the commit, since a concurrent request may have cached the data it
+# still read as committed between the flush and the commit.
+_UNCOMMITTED = "fsr_rbac_uncommitted"
+
+
+def _user_ids(scopes: t.Set[int]) -> t.Optional[t.Set[str]]:
+    if EVERYONE in scopes:
+        return None
+    return {str(scope) for scope in scopes}
+
+
+def _changed(session: Session, scopes: t.Set[int]) -> None:
+    """
+    Publishes a change to the authorization models affecting `scopes`:
+    records it for the other processes in the current transaction and drops
+    the authorization data cached by this one, now and once the transaction
+    commits
+    """
+    if not scopes:
+        return
+    if isinstance(session, scoped_session):
+        session = session()
+    user_ids = _user_ids(scopes)
+    record(session, user_ids)
+    _notify(user_ids)
+    session.info.setdefault(_UNCOMMITTED, set()).update(scopes)
+
+
+def _pending(target: t.Any) -> t.Optional[t.Set[int]]:
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(_PENDING, set())
+
+
+def _on_user_role_change(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is None:
+        return
+    pending.add(target.fsr_user_id)
+    # A reassigned row also affects the user it was taken from
+    pending.update(inspect(target).attrs.fsr_user_id.history.deleted)
+
+
+def _on_model_change(mapper, connection, target) -> None:
+    pending = _pending(target)
+    if pending is not None:
+        pending.add(EVERYONE)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        _changed(session, pending)
+
+
+def _after_commit(session: Session) -> None:
+    scopes = session.info.pop(_UNCOMMITTED, None)
+    if scopes:
+        _notify(_user_ids(scopes))
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_UNCOMMITTED, None)
+
+
+for _identifier in ("after_insert", "after_update", "after_delete"):
+    event.listen(UserRoleMixin, _identifier, _on_user_role_change, propagate=True)
+    for _mixin in (RoleMixin, ProjectMixin, PermissionMixin, RolePermissionMixin):
+        event.listen(_mixin, _identifier, _on_model_change, propagate=True)
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,16 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+fsr_cli = AppGroup("fsr", help="Flask-Secure-Roles commands.")
+
+
+@fsr_cli.command("export-graph")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+def export_graph_command(path: str) -> None:
+    """
+    Export the roles and permissions of every user to PATH
+    """
+    fsr = current_app.extensions["flask_secure_roles"]
+    users = fsr.export_graph(path)
+    click.echo(f"Exported the roles of {users} users to {path}")
@@ -17,6 +17,8 @@ class _Config:
     _permissionModel = "Permission"
     _userroleModel = "UserRole"
     _rolepermissionModel = "RolePermission"
+    _roleclosureModel = "RoleClosure"
+    _rbacversionModel = "RBACVersion"
 
     # Default table names for the models
     _userTablename = "User"
@@ -25,13 +27,16 @@ class _Config:
     _permissionTablename = "Permission"
     _userroleTablename = "UserRole"
     _rolepermissionTablename = "RolePermission"
+    _roleclosureTablename = "RoleClosure"
+    _rbacversionTablename = "RBACVersion"
 
     @property
-    def token_location(self) -> t.Literal["cookie"]:
+    def token_location(self) -> t.Literal["cookie", "header"]:
         """
-        Specifies the location of the access token and the refresh token
+        Specifies the location of the access token and the refresh token,
+        and of the role claims token when `FSR_TOKEN_CLAIMS` is enabled
 
-        :return: The location of the tokens. Default is "cookie".
+        :return: The location of the tokens, "cookie" or "header". Default is "cookie".
         :rtype: str
 
         .. note::
@@ -50,6 +55,8 @@ class _Config:
             "permissionModel": self._permissionModel,
             "userroleModel": self._userroleModel,
             "rolepermissionModel": self._rolepermissionModel,
+            "roleclosureModel": self._roleclosureModel,
+            "rbacversionModel": self._rbacversionModel,
         }
 
     @fsr_models.setter
@@ -87,6 +94,8 @@ class _Config:
             "permissionModel": self._permissionTablename,
             "userroleModel": self._userroleTablename,
             "rolepermissionModel": self._rolepermissionTablename,
+            "roleclosureModel": self._roleclosureTablename,
+            "rbacversionModel": self._rbacversionTablename,
         }
 
     @fsr_tables.setter
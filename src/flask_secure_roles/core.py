@@ -1,14 +1,66 @@
+import inspect
+import os
+import threading
+import time
 import typing as t
 from functools import wraps
-from flask import Flask, jsonify, g, has_request_context, has_app_context
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    jsonify,
+    g,
+    has_request_context,
+    has_app_context,
+    request,
+)
+from sqlalchemy import case, func, or_, select
 from werkzeug.local import LocalProxy
+from . import changes, hierarchy, provisioning
+from .cli import fsr_cli
+from .bitmask import RoleBits
+from .cache import CacheBackend, MemoryCache, RedisCache, subscribe
 from .errors import MisconfigurationError
-from .models import UserMixin
+from .graph import RoleGraph, export_graph
+from .models import (
+    UserMixin,
+    _held_roles,
+    _model,
+    _permission_pairs_query,
+    _project_ids,
+    _role_pairs_query,
+    _user_permissions_query,
+    _user_roles_query,
+)
+from .policy import AllOf, Check, Policy
+from .principal import Principal
+from .signals import _Measurement, _measure, authorization_checked
+from .snapshot import Snapshot
+from .tokens import dump_claims, load_claims
+from .versions import changes_since
 
 current_user = LocalProxy(lambda: _load_user())
 
+# Marks an endpoint whose registered policies are not compiled yet
+_UNRESOLVED = object()
+
 
 def _load_user() -> t.Union[UserMixin, None]:
+    user = _identity()
+    if not isinstance(user, Principal):
+        return user
+    # Loaded from the principal on first use, the checks only need its ID
+    if "_fsr_user_object" not in g:
+        fsr = current_app.extensions["flask_secure_roles"]
+        g._fsr_user_object = fsr._object_loader(user.fsr_user_id)
+    return g._fsr_user_object
+
+
+def _identity() -> t.Union[UserMixin, Principal, None]:
+    """
+    The user set by `user_loader`, model object or `Principal`
+    """
     if has_request_context() and has_app_context():
         if "_fsr_user" not in g:
             raise MisconfigurationError(
@@ -18,45 +70,867 @@ def _load_user() -> t.Union[UserMixin, None]:
     return None
 
 
+def _load_user_object(user_id: int) -> t.Union[UserMixin, None]:
+    return _db_session().get(_model("userModel"), user_id)
+
+
+def _db_session():
+    """
+    Session of the Flask-SQLAlchemy extension of the current app
+    """
+    if "sqlalchemy" not in current_app.extensions:
+        raise MisconfigurationError(
+            "Flask-SQLAlchemy must be initialized on the app for this operation."
+        )
+    return current_app.extensions["sqlalchemy"].session
+
+
+def _index(pairs: t.Iterable[t.Tuple[t.Optional[str], str]]) -> Snapshot:
+    """
+    Groups (project name, name) pairs into a snapshot. Global roles and their
+    permissions are kept under the `None` project.
+    """
+    return Snapshot.from_pairs(pairs)
+
+
+def _merge(
+    global_names: t.Optional[t.FrozenSet[str]], names: t.Optional[t.FrozenSet[str]]
+) -> t.Optional[t.FrozenSet[str]]:
+    """
+    Names of a project entry of a snapshot extended with the global ones
+    """
+    if global_names is None:
+        return names
+    if names is None:
+        return global_names
+    return names | global_names
+
+
+def _count_build() -> None:
+    # Lets the instrumentation tell checks answered from a cache apart
+    g._fsr_builds = g.get("_fsr_builds", 0) + 1
+
+
+def _build_snapshot(user: t.Union[UserMixin, Principal]) -> Snapshot:
+    """
+    Builds an immutable mapping of project name to the frozenset of role names
+    held by `user` in that project.
+    """
+    if isinstance(user, Principal):
+        return _index(_db_session().execute(_user_roles_query(user.fsr_user_id)))
+    if current_app.config["FSR_EAGER_LOADING"]:
+        return _index(user.project_roles())
+    return _index(
+        (role.fsr_project and role.fsr_project.name(), role.name())
+        for role in user._walk_roles()
+    )
+
+
+def _build_permissions(user: t.Union[UserMixin, Principal]) -> Snapshot:
+    """
+    Builds an immutable mapping of project name to the frozenset of permission
+    names granted to `user` in that project through its roles.
+    """
+    if isinstance(user, Principal):
+        return _index(_db_session().execute(_user_permissions_query(user.fsr_user_id)))
+    return _index(user.project_permissions())
+
+
 class FlaskSecureRoles:
     _guest_loader = None
+    _async_session = None
+    _object_loader = staticmethod(_load_user_object)
+    _warm_up_loader = None
+    cache: t.Union[CacheBackend, None] = None
+    graph: t.Union[RoleGraph, None] = None
 
     def __init__(self, app: t.Union[Flask, None] = None) -> None:
+        self._guest_principal: t.Optional[Principal] = None
+        self._role_bits = RoleBits()
+        self._claims = False
+        # Process the warm-up was started in, see `_warm_up_once`
+        self._warm_up_pid: t.Optional[int] = None
+        self._warm_up_lock = threading.Lock()
+        # Last version read from the `RBACVersionMixin` model and when to poll next
+        self._version: t.Optional[int] = None
+        self._version_due = 0.0
+        self._version_lock = threading.Lock()
+        self._endpoint_policies: t.Dict[str, Policy] = {}
+        self._blueprint_policies: t.Dict[str, Policy] = {}
+        # Compiled check of every endpoint seen by `enforce_policies`
+        self._endpoint_checks: t.Dict[t.Optional[str], t.Optional[Check]] = {}
         if app is not None:
             self.init_app(app)
 
     def init_app(self, app: Flask):
         app.config.setdefault("FSR_TOKEN_LOCATION", "cookie")
+        app.config.setdefault("FSR_EAGER_LOADING", True)
+        app.config.setdefault("FSR_CACHE", False)
+        app.config.setdefault("FSR_CACHE_SIZE", 1024)
+        app.config.setdefault("FSR_CACHE_TTL", 300)
+        app.config.setdefault("FSR_CACHE_BACKEND", "memory")
+        app.config.setdefault("FSR_CACHE_REDIS_URL", "redis://localhost:6379/0")
+        app.config.setdefault("FSR_TOKEN_CLAIMS", False)
+        app.config.setdefault("FSR_TOKEN_NAME", "fsr_claims")
+        app.config.setdefault("FSR_TOKEN_HEADER", "X-FSR-Claims")
+        app.config.setdefault("FSR_TOKEN_MAX_AGE", 3600)
+        app.config.setdefault("FSR_GRAPH_FILE", None)
+        app.config.setdefault("FSR_GRAPH_REFRESH_INTERVAL", 5)
+        app.config.setdefault("FSR_WARM_UP", False)
+        app.config.setdefault("FSR_RBAC_VERSION", False)
+        app.config.setdefault("FSR_RBAC_VERSION_INTERVAL", 1000)
 
+        if app.config["FSR_GRAPH_FILE"]:
+            self.graph = RoleGraph(
+                app.config["FSR_GRAPH_FILE"],
+                refresh_interval=app.config["FSR_GRAPH_REFRESH_INTERVAL"],
+            )
+        if app.config["FSR_CACHE"]:
+            self.cache = self._create_cache(app)
+        self._claims = app.config["FSR_TOKEN_CLAIMS"]
+        if (
+            self._claims
+            and not app.config["FSR_RBAC_VERSION"]
+            and (self.cache is None or isinstance(self.cache, MemoryCache))
+        ):
+            raise MisconfigurationError(
+                "`FSR_TOKEN_CLAIMS` requires `FSR_RBAC_VERSION` or a shared "
+                "`FSR_CACHE_BACKEND`."
+            )
+        if self.cache is not None or self._claims:
+            subscribe(self)
+
+        if app.config["FSR_WARM_UP"]:
+            if self.cache is None:
+                raise MisconfigurationError("`FSR_WARM_UP` requires `FSR_CACHE`.")
+            app.before_request(self._warm_up_once)
+        if app.config["FSR_RBAC_VERSION"]:
+            subscribe(self)
+            app.before_request(self._poll_versions)
+        app.before_request(self._reset_snapshot)
+        if self._claims:
+            app.after_request(self._store_claims)
+        app.cli.add_command(fsr_cli)
         app.extensions["flask_secure_roles"] = self
 
-    def user_loader(self, user: t.Union[UserMixin, None]) -> None:
+    @staticmethod
+    def _create_cache(app: Flask) -> CacheBackend:
+        backend = app.config["FSR_CACHE_BACKEND"]
+        if isinstance(backend, CacheBackend):
+            return backend
+        if backend == "memory":
+            return MemoryCache(
+                maxsize=app.config["FSR_CACHE_SIZE"], ttl=app.config["FSR_CACHE_TTL"]
+            )
+        if backend == "redis":
+            try:
+                import redis
+            except ImportError:
+                raise MisconfigurationError(
+                    "The `redis` package is required for `FSR_CACHE_BACKEND = 'redis'`."
+                )
+            return RedisCache(
+                redis.Redis.from_url(app.config["FSR_CACHE_REDIS_URL"]),
+                ttl=app.config["FSR_CACHE_TTL"],
+            )
+        raise MisconfigurationError(
+            f"Unknown `FSR_CACHE_BACKEND`: {backend!r}. Expected 'memory', 'redis' or a CacheBackend instance."
+        )
+
+    @staticmethod
+    def _reset_snapshot() -> None:
+        g.pop("_fsr_snapshot", None)
+        g.pop("_fsr_snapshot_built", None)
+        g.pop("_fsr_permissions", None)
+        g.pop("_fsr_role_version", None)
+
+    def _load(
+        self, key: str, build: t.Callable[[t.Union[UserMixin, Principal]], Snapshot]
+    ) -> Snapshot:
+        """
+        Builds the authorization data of the `current_user` with `build`, going
+        through the cache under `user_id() + key` when `FSR_CACHE` is enabled.
+        """
+        user = _identity()
+        if self.cache is None:
+            _count_build()
+            return build(user)
+        key = user.user_id() + key
+        value = self.cache.get(key)
+        if value is None:
+            generation = self.cache.generation()
+            _count_build()
+            value = build(user)
+            self.cache.set(key, value, generation=generation)
+        return value
+
+    async def _aload(self, key: str, query: t.Callable[[int], t.Any]) -> Snapshot:
+        """
+        Async counterpart of `_load`, running `query(fsr_user_id)` through the
+        session returned by the `async_session_loader` callback.
+        """
+        user = _identity()
+        if self.cache is not None:
+            key = user.user_id() + key
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+            generation = self.cache.generation()
+        _count_build()
+        async with self._async_session() as session:
+            value = _index(await session.execute(query(user.fsr_user_id)))
+        if self.cache is not None:
+            self.cache.set(key, value, generation=generation)
+        return value
+
+    async def _aprefetch(self, permissions: bool) -> None:
+        """
+        Resolves the authorization data needed by a check of an async view
+        without blocking the event loop, when an `async_session_loader` is set.
+        The check itself then reads it from `g`.
+        """
+        if self._async_session is None or self.graph is not None:
+            return
+        if permissions:
+            if "_fsr_permissions" not in g:
+                g._fsr_permissions = await self._aload(
+                    ":permissions", _user_permissions_query
+                )
+        elif "_fsr_snapshot" not in g:
+            snapshot = None
+            if self._claims:
+                # Read before the snapshot, so that a change made meanwhile
+                # revokes the token signed with it
+                g._fsr_role_version = self._role_version()
+                snapshot = self._snapshot_from_claims()
+            if snapshot is None:
+                snapshot = await self._aload("", _user_roles_query)
+                g._fsr_snapshot_built = True
+            g._fsr_snapshot = snapshot
+
+    def _protect(
+        self,
+        f: t.Callable,
+        allowed: t.Callable[[], bool],
+        check: str,
+        project: t.Optional[str] = None,
+        permissions: bool = False,
+    ) -> t.Callable:
+        """
+        Wraps the view `f` so that it runs only when `allowed()` is true, and
+        answers 401 otherwise. Coroutine views get a coroutine wrapper. Every
+        evaluation is measured and reported through `authorization_checked`
+        when the signal has receivers.
+        """
+        if inspect.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def decorated_function(*args, **kwargs):
+                if not authorization_checked.receivers:
+                    await self._aprefetch(permissions)
+                    valid = allowed()
+                else:
+                    measurement = _Measurement()
+                    try:
+                        await self._aprefetch(permissions)
+                        valid = allowed()
+                    finally:
+                        measurement.stop()
+                    measurement.report(check, project, valid)
+                if valid:
+                    return await f(*args, **kwargs)
+                else:
+                    return jsonify(error="Unauthorized"), 401
+
+            return decorated_function
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if authorization_checked.receivers:
+                valid = _measure(check, project, allowed)
+            else:
+                valid = allowed()
+            if valid:
+                return f(*args, **kwargs)
+            else:
+                return jsonify(error="Unauthorized"), 401
+
+        return decorated_function
+
+    def _snapshot(self) -> Snapshot:
+        """
+        Authorization snapshot of the `current_user` for the current request.
+        Built on the first role check and reused by every later check of the
+        request. With `FSR_CACHE` enabled it is also reused across requests,
+        and the snapshot of the guest always is. With `FSR_GRAPH_FILE` set it
+        is read from the mapped export instead of the database.
+        """
+        if "_fsr_snapshot" not in g:
+            snapshot = None
+            if self._claims:
+                # Read before the snapshot, so that a change made meanwhile
+                # revokes the token signed with it
+                g._fsr_role_version = self._role_version()
+                snapshot = self._snapshot_from_claims()
+            if snapshot is None and self.graph is not None:
+                snapshot = self.graph.roles(_identity().fsr_user_id)
+            elif snapshot is None:
+                snapshot = self._load("", _build_snapshot)
+                g._fsr_snapshot_built = True
+            g._fsr_snapshot = snapshot
+        return g._fsr_snapshot
+
+    def _role_version(self) -> int:
+        """
+        Counter moved by every change to the authorization models, used to
+        revoke the claims tokens issued before the change. It is shared by
+        every process: the version of the `RBACVersionMixin` model when
+        `FSR_RBAC_VERSION` is enabled, else the generation of the cache backend.
+        """
+        if current_app.config["FSR_RBAC_VERSION"]:
+            if self._version is None:
+                return changes_since(_db_session(), None)[0]
+            return self._version
+        return self.cache.generation()
+
+    def _snapshot_from_claims(self) -> t.Union[Snapshot, None]:
+        """
+        Role snapshot carried by the claims token of the request, if the token
+        is valid, belongs to the `current_user` and is of the role version read
+        for the request.
+        """
+        if current_app.config["FSR_TOKEN_LOCATION"] == "header":
+            token = request.headers.get(current_app.config["FSR_TOKEN_HEADER"])
+        else:
+            token = request.cookies.get(current_app.config["FSR_TOKEN_NAME"])
+        if not token:
+            return None
+        claims = load_claims(
+            current_app.secret_key, token, current_app.config["FSR_TOKEN_MAX_AGE"]
+        )
+        if (
+            claims is None
+            or claims.user_id != _identity().user_id()
+            or claims.role_version != g._fsr_role_version
+        ):
+            return None
+        return claims.snapshot
+
+    def claims_token(self) -> str:
+        """
+        Signed token carrying the role snapshot of the `current_user`.
+        Requests presenting it in the configured cookie or header are authorized
+        without querying the database until the roles change.
+        """
+        snapshot = self._snapshot()
+        version = g.get("_fsr_role_version")
+        if version is None:
+            version = self._role_version()
+        return dump_claims(
+            current_app.secret_key, _identity().user_id(), version, snapshot
+        )
+
+    def _store_claims(self, response: Response) -> Response:
+        # The snapshot of the guest is kept by the process, it needs no token
+        if not g.get("_fsr_snapshot_built") or _identity() is self._guest_principal:
+            return response
+        token = self.claims_token()
+        if current_app.config["FSR_TOKEN_LOCATION"] == "header":
+            response.headers[current_app.config["FSR_TOKEN_HEADER"]] = token
+        else:
+            response.set_cookie(
+                current_app.config["FSR_TOKEN_NAME"],
+                token,
+                max_age=current_app.config["FSR_TOKEN_MAX_AGE"],
+                secure=current_app.config["SESSION_COOKIE_SECURE"],
+                httponly=True,
+                samesite=current_app.config["SESSION_COOKIE_SAMESITE"],
+            )
+        return response
+
+    def _mask(self, project: str) -> t.Union[int, None]:
+        """
+        Bitmask of the roles of the `current_user` in `project`, global roles
+        included, or `None` if the user has no role in it. Computed once per
+        project and snapshot, so a snapshot served from a cache reuses it.
+        """
+        return self._snapshot().mask(project, self._role_bits)
+
+    def _permissions(self) -> Snapshot:
+        """
+        Effective permissions of the `current_user` per project, resolved once
+        per request like the role snapshot.
+        """
+        if "_fsr_permissions" not in g:
+            if self.graph is not None:
+                g._fsr_permissions = self.graph.permissions(_identity().fsr_user_id)
+            else:
+                g._fsr_permissions = self._load(":permissions", _build_permissions)
+        return g._fsr_permissions
+
+    def _project_permissions(self, project: str) -> t.Optional[t.FrozenSet[str]]:
+        """
+        Permissions of the `current_user` in `project`, those of global roles
+        included, or `None` if none of its roles applies to the project
+        """
+        permissions = self._permissions()
+        return _merge(permissions.get(None), permissions.get(project))
+
+    def _invalidate(self, user_ids: t.Union[t.Set[str], None]) -> None:
+        """
+        Drops the cached authorization data of `user_ids`, or of every user
+        when `user_ids` is `None`.
+        """
+        if user_ids is None:
+            _project_ids.clear()
+        # Read the version again on the next request, so that the claims tokens
+        # issued before a change made by this process are not accepted until
+        # the poll interval elapses
+        self._version_due = 0.0
+        if self.cache is None:
+            return
+        if user_ids is None or self._claims:
+            self.cache.bump_generation()
+        else:
+            for user_id in user_ids:
+                self.cache.delete(user_id)
+                self.cache.delete(user_id + ":permissions")
+
+    def _poll_versions(self) -> None:
+        """
+        Drops the authorization data of the users whose roles were changed by
+        other processes, as recorded in the `RBACVersionMixin` model. The model
+        is read at most every `FSR_RBAC_VERSION_INTERVAL` milliseconds, with a
+        single primary key lookup while nothing changed.
+        """
+        now = time.monotonic()
+        if now < self._version_due or not self._version_lock.acquire(blocking=False):
+            return
+        try:
+            interval = current_app.config["FSR_RBAC_VERSION_INTERVAL"] / 1000
+            self._version, user_ids = changes_since(_db_session(), self._version)
+            if user_ids is None or user_ids:
+                self._invalidate(user_ids)
+            self._version_due = now + interval
+        finally:
+            self._version_lock.release()
+
+    def user_loader(self, user: t.Union[UserMixin, Principal, int, str, None]) -> None:
         """
         Method to load the user from the user's authentication system.
         Sets the current_user for further usage
 
-        :param user: FSR User model object of the user
+        :param user: FSR User model object of the user, or its user ID or
+            `Principal`. Given an ID, the checks run without loading the user
+            row, which is only fetched once the view touches `current_user`.
         """
         if self._guest_loader is None:
             raise MisconfigurationError(
                 "The `guest_user_loader` method is not implemented properly."
             )
         if user is None:
-            user = self._guest_loader()
-        if not issubclass(user.__class__, UserMixin):
+            user = self._guest()
+        else:
+            user = self._as_identity(user)
+        g._fsr_user = user
+        g.pop("_fsr_user_object", None)
+        self._reset_snapshot()
+
+    @staticmethod
+    def _as_identity(user: t.Any) -> t.Union[UserMixin, Principal]:
+        if isinstance(user, (int, str)) and not isinstance(user, bool):
+            try:
+                user = Principal(user)
+            except ValueError:
+                pass
+        if not isinstance(user, (UserMixin, Principal)):
             raise TypeError(
-                "User must be an instance of a class derived from UserMixin"
+                "User must be an instance of a class derived from UserMixin, "
+                "a Principal or a user ID"
             )
-        g._fsr_user = user
+        return user
+
+    def _guest(self) -> t.Union[UserMixin, Principal]:
+        """
+        Principal of the guest user, resolved with the `guest_user_loader`
+        callback once per process. Its authorization data goes through the
+        cache like that of any user, so that every process sees its changes.
+        A guest object without a user ID, e.g. never flushed, is used as it is
+        and resolved again on every request.
+        """
+        guest = self._guest_principal
+        if guest is None:
+            user = self._as_identity(self._guest_loader())
+            if isinstance(user, UserMixin):
+                if user.fsr_user_id is None:
+                    return user
+                user = Principal(user.fsr_user_id)
+            guest = self._guest_principal = user
+        return guest
 
     def guest_user_loader(self, callback: t.Callable) -> None:
+        """
+        Registers the callback returning the user model object or user ID used
+        for `user_loader(None)`. It is called once, and `current_user` is then
+        loaded from the ID like for a `Principal`.
+        """
         if callable(callback):
             self._guest_loader = callback
+            self._guest_principal = None
         else:
             raise TypeError(
                 f"Expected callback to be a callable function or object, but received a {type(callback).__name__}."
             )
 
+    def user_object_loader(self, callback: t.Callable[[int], t.Any]) -> None:
+        """
+        Registers a callback returning the user model object of a user ID. It
+        resolves `current_user` when `user_loader` was given a user ID or a
+        `Principal`. Defaults to a primary key lookup in the Flask-SQLAlchemy
+        session.
+        """
+        if callable(callback):
+            self._object_loader = callback
+        else:
+            raise TypeError(
+                f"Expected callback to be a callable function or object, but received a {type(callback).__name__}."
+            )
+
+    def async_session_loader(self, callback: t.Callable) -> None:
+        """
+        Registers a callback returning a SQLAlchemy `AsyncSession`, e.g. an
+        `async_sessionmaker`. The decorators of `async def` views then resolve
+        the authorization data through it instead of the blocking ORM session.
+        The session is closed once the data is loaded.
+        """
+        if callable(callback):
+            self._async_session = callback
+        else:
+            raise TypeError(
+                f"Expected callback to be a callable function or object, but received a {type(callback).__name__}."
+            )
+
+    def warm_up_loader(
+        self, callback: t.Callable[[], t.Iterable[t.Union[int, str]]]
+    ) -> None:
+        """
+        Registers a callback returning the IDs of the users whose authorization
+        data `warm_up` preloads, e.g. the recently active ones.
+        """
+        if callable(callback):
+            self._warm_up_loader = callback
+        else:
+            raise TypeError(
+                f"Expected callback to be a callable function or object, but received a {type(callback).__name__}."
+            )
+
+    def warm_up(
+        self,
+        user_ids: t.Optional[t.Iterable[t.Union[int, str]]] = None,
+        chunk_size: int = 500,
+    ) -> int:
+        """
+        Loads the role snapshots and permissions of many users into the cache,
+        with two set based queries per `chunk_size` users, so that their first
+        requests are answered without querying the database.
+
+        :param user_ids: IDs of the users, defaults to those returned by the
+            `warm_up_loader` callback
+        :param chunk_size: Number of users loaded per query
+        :return: The number of users loaded
+        :rtype: int
+        """
+        if self.cache is None:
+            raise MisconfigurationError("Warming up requires `FSR_CACHE`.")
+        if user_ids is None:
+            if self._warm_up_loader is None:
+                return 0
+            user_ids = self._warm_up_loader()
+        Role = _model("roleModel")
+        keys = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+        session = _db_session()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start : start + chunk_size]
+            held = _held_roles(lambda column: column.in_(chunk))
+            queries = {
+                "": _role_pairs_query(held).add_columns(held.c.fsr_user_id),
+                ":permissions": _permission_pairs_query()
+                .join(held, held.c.fsr_role_id == Role.fsr_role_id)
+                .add_columns(held.c.fsr_user_id)
+                .distinct(),
+            }
+            generation = self.cache.generation()
+            for key, stmt in queries.items():
+                pairs: t.Dict[int, t.List[t.Tuple[t.Optional[str], str]]] = {
+                    user_id: [] for user_id in chunk
+                }
+                for project, name, user_id in session.execute(stmt):
+                    pairs[user_id].append((project, name))
+                for user_id, items in pairs.items():
+                    self.cache.set(
+                        str(user_id) + key, _index(items), generation=generation
+                    )
+        return len(keys)
+
+    def start_warm_up(self, app: Flask) -> threading.Thread:
+        """
+        Runs `warm_up` for the users of the `warm_up_loader` callback on a
+        daemon thread, so the process serves requests meanwhile. With
+        `FSR_WARM_UP` enabled it is started by the first request of every
+        process, i.e. in every worker of a prefork server.
+        """
+
+        def run():
+            with app.app_context():
+                try:
+                    self.warm_up()
+                except Exception:
+                    app.logger.exception("Warming up the authorization cache failed")
+
+        thread = threading.Thread(target=run, name="fsr-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up_once(self) -> None:
+        # Threads do not survive a fork, so every worker starts its own
+        pid = os.getpid()
+        if self._warm_up_pid == pid:
+            return
+        with self._warm_up_lock:
+            if self._warm_up_pid != pid:
+                self._warm_up_pid = pid
+                self.start_warm_up(current_app._get_current_object())
+
+    def authorize_many(
+        self,
+        user_ids: t.Iterable[t.Union[int, str]],
+        project: str,
+        roles: t.List[str],
+        mode: t.Literal["all", "any", "none"] = "all",
+        chunk_size: int = 500,
+    ) -> t.Dict[t.Union[int, str], bool]:
+        """
+        Checks many users at once with the semantics of the role decorators:
+        "all" as `required_roles`, "any" as `any_role` and "none" as `forbid_roles`.
+        Runs one aggregated query per `chunk_size` users. Global roles count
+        in every project.
+
+        :param user_ids: IDs of the users to check
+        :param project: Project name
+        :param roles: Role names
+        :param mode: "all", "any" or "none"
+        :param chunk_size: Number of users checked per query
+        :return: Mapping of every given user ID to the result of its check
+        :rtype: Dict[Union[int, str], bool]
+        """
+        if mode not in ("all", "any", "none"):
+            raise ValueError(
+                f"Unknown mode: {mode!r}. Expected 'all', 'any' or 'none'."
+            )
+        Role = _model("roleModel")
+        Project = _model("projectModel")
+        required = set(roles)
+        matched = func.count(
+            case((Role.fsr_role_name.in_(required), Role.fsr_role_name)).distinct()
+        )
+
+        def stmt(chunk):
+            held = _held_roles(lambda column: column.in_(chunk))
+            return (
+                select(held.c.fsr_user_id, matched)
+                .select_from(held)
+                .join(Role, held.c.fsr_role_id == Role.fsr_role_id)
+                .outerjoin(Project, Role.fsr_project_id == Project.fsr_project_id)
+                .where(
+                    or_(
+                        Project.fsr_project_name == project,
+                        Role.fsr_project_id.is_(None),
+                    )
+                )
+                .group_by(held.c.fsr_user_id)
+            )
+
+        session = _db_session()
+        ids = {user_id: int(user_id) for user_id in user_ids}
+        keys = list(ids.values())
+        allowed = set()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start : start + chunk_size]
+            for user_id, count in session.execute(stmt(chunk)):
+                if mode == "all":
+                    valid = count == len(required)
+                elif mode == "any":
+                    valid = count > 0
+                else:
+                    valid = count == 0
+                if valid:
+                    allowed.add(user_id)
+        return {user_id: key in allowed for user_id, key in ids.items()}
+
+    def grant(
+        self,
+        users: t.Iterable[provisioning.UserRef],
+        project: t.Optional[str],
+        roles: t.List[str],
+        chunk_size: int = 500,
+    ) -> provisioning.Changes:
+        """
+        Grants `roles` of `project`, or global roles when `project` is `None`,
+        to every user in `users`, given as user model objects or user IDs,
+        with batched set based statements. The caller commits the session.
+
+        :return: The (user ID, role name) pairs that were added
+        :rtype: List[Tuple[int, str]]
+        """
+        return provisioning.grant(_db_session(), users, project, roles, chunk_size)
+
+    def revoke(
+        self,
+        users: t.Iterable[provisioning.UserRef],
+        project: t.Optional[str],
+        roles: t.List[str],
+        chunk_size: int = 500,
+    ) -> provisioning.Changes:
+        """
+        Revokes `roles` of `project` from every user in `users`, given as user
+        model objects or user IDs, with batched set based statements.
+        The caller commits the session.
+
+        :return: The (user ID, role name) pairs that were removed
+        :rtype: List[Tuple[int, str]]
+        """
+        return provisioning.revoke(_db_session(), users, project, roles, chunk_size)
+
+    def sync_roles(
+        self, user: provisioning.UserRef, project: t.Optional[str], roles: t.List[str]
+    ) -> t.Tuple[provisioning.Changes, provisioning.Changes]:
+        """
+        Makes `roles` the exact set of roles of `user` in `project`.
+        The caller commits the session.
+
+        :return: The (user ID, role name) pairs that were added and removed
+        :rtype: Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]
+        """
+        return provisioning.sync_roles(_db_session(), user, project, roles)
+
+    def rebuild_role_closure(self) -> int:
+        """
+        Recomputes the role hierarchy closure from `RoleMixin.fsr_parent_id`,
+        needed after bulk changes to the parents that bypassed the ORM.
+        The caller commits the session.
+
+        :return: The number of closure rows
+        :rtype: int
+        """
+        return hierarchy.rebuild_role_closure(_db_session())
+
+    def export_graph(self, path: str) -> int:
+        """
+        Writes the roles and permissions of every user to the file at `path`,
+        to be served by the app with `FSR_GRAPH_FILE` set to it.
+        Also available as `flask fsr export-graph PATH`.
+
+        :return: The number of users written
+        :rtype: int
+        """
+        return export_graph(_db_session(), path)
+
+    def register_policy(self, target: t.Union[str, Blueprint], expr: Policy) -> None:
+        """
+        Registers the policy expression `expr` for an endpoint name or for every
+        endpoint of a blueprint, replacing the one registered before. A request
+        must satisfy the policies of its endpoint and of all its blueprints.
+        They are enforced by `enforce_policies`, which has to be registered as
+        a `before_request` hook after the one calling `user_loader`:
+
+        .. code-block:: python
+
+            app.before_request(fsr.enforce_policies)
+
+        :param target: Endpoint name, e.g. "admin.index", or a `Blueprint`
+        :param Policy expr: Expression built from `flask_secure_roles.policy.Role` with `&`, `|` and `~`.
+        """
+        if not isinstance(expr, Policy):
+            raise TypeError(
+                f"Expected a Policy expression, but received a {type(expr).__name__}."
+            )
+        if isinstance(target, Blueprint):
+            self._blueprint_policies[target.name] = expr
+        elif isinstance(target, str):
+            self._endpoint_policies[target] = expr
+        else:
+            raise TypeError(
+                f"Expected an endpoint name or a Blueprint, but received a {type(target).__name__}."
+            )
+        self._endpoint_checks = {}
+
+    def unregister_policy(self, target: t.Union[str, Blueprint]) -> None:
+        """
+        Removes the policy registered for an endpoint name or a blueprint
+        """
+        if isinstance(target, Blueprint):
+            self._blueprint_policies.pop(target.name, None)
+        else:
+            self._endpoint_policies.pop(target, None)
+        self._endpoint_checks = {}
+
+    def dump_policies(self) -> t.Dict[str, t.Dict[str, str]]:
+        """
+        Registered policies for auditing, as the `repr` of the expressions
+
+        :return: Mapping of "endpoints" and "blueprints" to the policies by name
+        :rtype: Dict[str, Dict[str, str]]
+        """
+        return {
+            "endpoints": {
+                name: repr(expr) for name, expr in self._endpoint_policies.items()
+            },
+            "blueprints": {
+                name: repr(expr) for name, expr in self._blueprint_policies.items()
+            },
+        }
+
+    def _resolve_policy(
+        self, endpoint: t.Optional[str], blueprints: t.List[str]
+    ) -> t.Optional[Check]:
+        """
+        Compiles the registered policies that apply to `endpoint` into one
+        check, or `None` if there are none
+        """
+        exprs = [
+            self._blueprint_policies[name]
+            for name in reversed(blueprints)
+            if name in self._blueprint_policies
+        ]
+        if endpoint in self._endpoint_policies:
+            exprs.append(self._endpoint_policies[endpoint])
+        if not exprs:
+            return None
+        return AllOf(*exprs).compile(self._role_bits)
+
+    def enforce_policies(self) -> t.Optional[t.Tuple[Response, int]]:
+        """
+        `before_request` hook answering 401 when the `current_user` does not
+        satisfy the policies registered for the endpoint of the request.
+        Policies are compiled on the first request of every endpoint, later
+        requests cost one lookup and one evaluation of the snapshot.
+        """
+        endpoint = request.endpoint
+        checks = self._endpoint_checks
+        check = checks.get(endpoint, _UNRESOLVED)
+        if check is _UNRESOLVED:
+            check = self._resolve_policy(endpoint, request.blueprints)
+            checks[endpoint] = check
+        if check is None:
+            return None
+        if authorization_checked.receivers:
+            valid = _measure("policy", None, lambda: check(self._mask))
+        else:
+            valid = check(self._mask)
+        if valid:
+            return None
+        return jsonify(error="Unauthorized"), 401
+
     def required_roles(self, project: str, roles: t.List[str]):
         """
         Allows the request only if the `current_user` has all the `roles` required for the current project.
@@ -64,21 +938,14 @@ class FlaskSecureRoles:
         :param List[str] roles: A list of roles, all of which are required.
         """
 
-        def decorator(f):
-            @wraps(f)
-            def decorated_function(*args, **kwargs):
-                valid = False
-                all_roles = current_user.roles(project_name=project)
-                if project in current_user.projects() and all(
-                    [role in all_roles for role in roles]
-                ):
-                    valid = True
-                if valid:
-                    return f(*args, **kwargs)
-                else:
-                    return jsonify(error="Unauthorized"), 401
+        required = self._role_bits.mask(project, roles)
 
-            return decorated_function
+        def allowed() -> bool:
+            mask = self._mask(project)
+            return mask is not None and mask & required == required
+
+        def decorator(f):
+            return self._protect(f, allowed, "required_roles", project)
 
         return decorator
 
@@ -89,21 +956,14 @@ class FlaskSecureRoles:
         :param List[str] roles: A list of roles that the user must have at least one of.
         """
 
-        def decorator(f):
-            @wraps(f)
-            def decorated_function(*args, **kwargs):
-                valid = False
-                all_roles = current_user.roles(project_name=project)
-                if project in current_user.projects() and any(
-                    [role in all_roles for role in roles]
-                ):
-                    valid = True
-                if valid:
-                    return f(*args, **kwargs)
-                else:
-                    return jsonify(error="Unauthorized"), 401
+        required = self._role_bits.mask(project, roles)
 
-            return decorated_function
+        def allowed() -> bool:
+            mask = self._mask(project)
+            return mask is not None and mask & required != 0
+
+        def decorator(f):
+            return self._protect(f, allowed, "any_role", project)
 
         return decorator
 
@@ -114,20 +974,69 @@ class FlaskSecureRoles:
         :param List[str] roles: A list of roles that the user must not have.
         """
 
+        forbidden = self._role_bits.mask(project, roles)
+
+        def allowed() -> bool:
+            mask = self._mask(project)
+            return mask is not None and mask & forbidden == 0
+
         def decorator(f):
-            @wraps(f)
-            def decorated_function(*args, **kwargs):
-                valid = False
-                all_roles = current_user.roles(project_name=project)
-                if project in current_user.projects() and not any(
-                    [role in all_roles for role in roles]
-                ):
-                    valid = True
-                if valid:
-                    return f(*args, **kwargs)
-                else:
-                    return jsonify(error="Unauthorized"), 401
+            return self._protect(f, allowed, "forbid_roles", project)
 
-            return decorated_function
+        return decorator
+
+    def required_permissions(self, project: str, permissions: t.List[str]):
+        """
+        Allows the request only if the roles of the `current_user` grant all the `permissions` within the current project.
+        :param str project: The name of the project to which the endpoint belongs.
+        :param List[str] permissions: A list of permissions, all of which are required.
+        """
+
+        required = frozenset(permissions)
+
+        def allowed() -> bool:
+            user_permissions = self._project_permissions(project)
+            return user_permissions is not None and required.issubset(user_permissions)
+
+        def decorator(f):
+            return self._protect(
+                f, allowed, "required_permissions", project, permissions=True
+            )
+
+        return decorator
+
+    def any_permission(self, project: str, permissions: t.List[str]):
+        """
+        Allows the request only if the roles of the `current_user` grant any of the specified `permissions` within the current project.
+        :param str project: The name of the project to which the endpoint belongs.
+        :param List[str] permissions: A list of permissions that the user must have at least one of.
+        """
+
+        required = frozenset(permissions)
+
+        def allowed() -> bool:
+            user_permissions = self._project_permissions(project)
+            return user_permissions is not None and not required.isdisjoint(
+                user_permissions
+            )
+
+        def decorator(f):
+            return self._protect(
+                f, allowed, "any_permission", project, permissions=True
+            )
+
+        return decorator
+
+    def policy(self, expr: Policy):
+        """
+        Allows the request only if the `current_user` satisfies the policy expression `expr`.
+        The expression is compiled once, and every project it refers to is answered from the single per-request snapshot.
+        :param Policy expr: Expression built from `flask_secure_roles.policy.Role` with `&`, `|` and `~`.
+        """
+
+        check = expr.compile(self._role_bits)
+
+        def decorator(f):
+            return self._protect(f, lambda: check(self._mask), "policy")
 
         return decorator
@@ -8,6 +8,8 @@ ModelsDict = t.Dict[
         "permissionModel",
         "userroleModel",
         "rolepermissionModel",
+        "roleclosureModel",
+        "rbacversionModel",
     ],
     str,
 ]
@@ -0,0 +1,303 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import typing as t
+from array import array
+from bisect import bisect_left
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import _held_roles, _model
+from .snapshot import Snapshot
+
+__all__ = ["RoleGraph", "export_graph"]
+
+MAGIC = b"FSRG"
+# Version of the file layout, bumped whenever it changes
+FORMAT_VERSION = 1
+
+# Magic, version, byte order, then the number of strings, roles, users,
+# user -> role edges and role -> permission edges and the string bytes
+_HEADER = struct.Struct("<4sHH6Q")
+# Project index of a global role
+_NO_PROJECT = 0xFFFFFFFF
+
+# (name, typecode, length) of the arrays following the header, in file order
+Layout = t.List[t.Tuple[str, str, int]]
+
+
+def _layout(
+    strings: int, roles: int, users: int, edges: int, grants: int, blob: int
+) -> Layout:
+    return [
+        ("user_ids", "q", users),
+        ("user_offsets", "I", users + 1),
+        ("user_roles", "I", edges),
+        ("role_projects", "I", roles),
+        ("role_names", "I", roles),
+        ("grant_offsets", "I", roles + 1),
+        ("grants", "I", grants),
+        ("string_offsets", "I", strings + 1),
+        ("strings", "B", blob),
+    ]
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Strings:
+    """
+    Interns the names written to the file into indexes of its string table
+    """
+
+    def __init__(self) -> None:
+        self.index: t.Dict[str, int] = {}
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+
+    def add(self, value: t.Optional[str]) -> int:
+        if value is None:
+            return _NO_PROJECT
+        value = str(value)
+        index = self.index.get(value)
+        if index is None:
+            index = self.index[value] = len(self.index)
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return index
+
+
+def export_graph(session: Session, path: str, batch_size: int = 10000) -> int:
+    """
+    Writes the whole authorization graph, i.e. the roles of every user with
+    implied roles included and the permissions of every role, to the file at
+    `path` for `RoleGraph`. The file is written next to `path` and then moved
+    over it, so processes reading the previous export are not disturbed.
+
+    :param session: Session the mixin tables are read with
+    :param path: Path of the file
+    :param batch_size: Number of user -> role rows fetched at a time
+    :return: The number of users written
+    :rtype: int
+    """
+    Role = _model("roleModel")
+    Project = _model("projectModel")
+    RolePermission = _model("rolepermissionModel")
+    Permission = _model("permissionModel")
+    strings = _Strings()
+
+    role_index: t.Dict[int, int] = {}
+    role_projects, role_names = array("I"), array("I")
+    for role_id, project, name in session.execute(
+        select(Role.fsr_role_id, Project.fsr_project_name, Role.fsr_role_name)
+        .outerjoin(Project, Role.fsr_project_id == Project.fsr_project_id)
+        .order_by(Role.fsr_role_id)
+    ):
+        role_index[role_id] = len(role_index)
+        role_projects.append(strings.add(project))
+        role_names.append(strings.add(name))
+
+    role_grants: t.List[t.List[int]] = [[] for _ in role_index]
+    for role_id, name in session.execute(
+        select(RolePermission.fsr_role_id, Permission.fsr_permission_name).join(
+            Permission,
+            Permission.fsr_permission_id == RolePermission.fsr_permission_id,
+        )
+    ):
+        if role_id in role_index:
+            role_grants[role_index[role_id]].append(strings.add(name))
+    grant_offsets, grants = array("I", [0]), array("I")
+    for names in role_grants:
+        grants.extend(sorted(set(names)))
+        grant_offsets.append(len(grants))
+
+    held = _held_roles(lambda column: column.is_not(None))
+    user_ids, user_offsets, user_roles = array("q"), array("I", [0]), array("I")
+    for user_id, role_id in session.execute(
+        select(held.c.fsr_user_id, held.c.fsr_role_id)
+        .distinct()
+        .order_by(held.c.fsr_user_id, held.c.fsr_role_id)
+        .execution_options(yield_per=batch_size)
+    ):
+        if role_id not in role_index:
+            continue
+        if not user_ids or user_ids[-1] != user_id:
+            if user_ids:
+                user_offsets.append(len(user_roles))
+            user_ids.append(user_id)
+        user_roles.append(role_index[role_id])
+    if user_ids:
+        user_offsets.append(len(user_roles))
+
+    sections = {
+        "user_ids": user_ids,
+        "user_offsets": user_offsets,
+        "user_roles": user_roles,
+        "role_projects": role_projects,
+        "role_names": role_names,
+        "grant_offsets": grant_offsets,
+        "grants": grants,
+        "string_offsets": strings.offsets,
+        "strings": strings.blob,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".fsr-graph-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    sys.byteorder == "little",
+                    len(strings.index),
+                    len(role_index),
+                    len(user_ids),
+                    len(user_roles),
+                    len(grants),
+                    len(strings.blob),
+                )
+            )
+            for name, _, _ in _layout(0, 0, 0, 0, 0, 0):
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                f.write(sections[name])
+        # mkstemp creates the file readable by its owner only, give it the mode
+        # `open` would, so that workers running as other users can map it
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(user_ids)
+
+
+class _Mapped:
+    """
+    One mapped export, replaced as a whole when the file changes
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < _HEADER.size:
+            raise ValueError(f"{path!r} is not an RBAC graph export")
+        magic, version, little, *counts = _HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path!r} is not an RBAC graph export of this version")
+        if bool(little) != (sys.byteorder == "little"):
+            raise ValueError(f"{path!r} was exported on a host of another byte order")
+        view = memoryview(self.map)
+        offset = _HEADER.size
+        for name, typecode, length in _layout(*counts):
+            offset = _align(offset)
+            size = length * struct.calcsize(typecode)
+            if offset + size > len(self.map):
+                raise ValueError(f"{path!r} is truncated")
+            setattr(self, name, view[offset : offset + size].cast(typecode))
+            offset += size
+        self.names: t.Dict[int, str] = {}
+
+    def name(self, index: int) -> t.Optional[str]:
+        if index == _NO_PROJECT:
+            return None
+        name = self.names.get(index)
+        if name is None:
+            offsets = self.string_offsets
+            name = bytes(self.strings[offsets[index] : offsets[index + 1]])
+            name = self.names[index] = sys.intern(name.decode("utf-8"))
+        return name
+
+    def roles_of(self, user_id: int) -> t.Sequence[int]:
+        user_ids = self.user_ids
+        position = bisect_left(user_ids, user_id)
+        if position == len(user_ids) or user_ids[position] != user_id:
+            return ()
+        offsets = self.user_offsets
+        return self.user_roles[offsets[position] : offsets[position + 1]]
+
+
+class RoleGraph:
+    """
+    Read-only view of a file written by `export_graph`. The file is mapped
+    into memory, so the processes of a prefork server share a single copy of
+    it in the page cache, and user lookups binary search its sorted arrays
+    instead of querying the database.
+
+    A new export of the file is picked up at most `refresh_interval` seconds
+    after it was moved into place.
+
+    :param path: Path of the file
+    :param refresh_interval: Seconds between checks of the file for a new
+        export. `None` disables the checks.
+    """
+
+    def __init__(self, path: str, refresh_interval: t.Optional[float] = 5.0) -> None:
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._mapped = _Mapped(path)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """
+        Maps the file again if it was replaced by a new export
+
+        :return: `True` if a new export was mapped
+        :rtype: bool
+        """
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return False
+            current = self._mapped.stat
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == (
+                current.st_ino,
+                current.st_mtime_ns,
+                current.st_size,
+            ):
+                return False
+            # The previous map is released once no lookup uses it anymore
+            self._mapped = _Mapped(self.path)
+            return True
+
+    def _current(self) -> _Mapped:
+        interval = self.refresh_interval
+        if interval is not None and time.monotonic() - self._checked >= interval:
+            self.refresh()
+        return self._mapped
+
+    def __len__(self) -> int:
+        return len(self._mapped.user_ids)
+
+    def roles(self, user_id: int) -> Snapshot:
+        """
+        Role snapshot of the user `user_id`, implied roles included
+        """
+        mapped = self._current()
+        return Snapshot.from_pairs(
+            (
+                mapped.name(mapped.role_projects[role]),
+                mapped.name(mapped.role_names[role]),
+            )
+            for role in mapped.roles_of(int(user_id))
+        )
+
+    def permissions(self, user_id: int) -> Snapshot:
+        """
+        Permissions granted to the user `user_id` through its roles, per project
+        """
+        mapped = self._current()
+        offsets, grants = mapped.grant_offsets, mapped.grants
+        return Snapshot.from_pairs(
+            (mapped.name(mapped.role_projects[role]), mapped.name(grant))
+            for role in mapped.roles_of(int(user_id))
+            for grant in grants[offsets[role] : offsets[role + 1]]
+        )
@@ -0,0 +1,155 @@
+import typing as t
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from .changes import _changed
+from .models import RoleMixin, _closure_model, _model
+from .versions import EVERYONE
+
+__all__ = ["rebuild_role_closure"]
+
+# (role ID, depth) pairs
+Levels = t.List[t.Tuple[int, int]]
+
+
+def _ancestors(connection: Connection, closure, role_id: int) -> Levels:
+    return list(
+        connection.execute(
+            select(closure.c.fsr_ancestor_id, closure.c.fsr_depth).where(
+                closure.c.fsr_descendant_id == role_id
+            )
+        )
+    )
+
+
+def _subtree(connection: Connection, closure, role_id: int) -> Levels:
+    """
+    `role_id` and the roles below it
+    """
+    return [(role_id, 0)] + list(
+        connection.execute(
+            select(closure.c.fsr_descendant_id, closure.c.fsr_depth).where(
+                closure.c.fsr_ancestor_id == role_id
+            )
+        )
+    )
+
+
+def _detach(connection: Connection, closure, role_id: int) -> None:
+    """
+    Removes the paths from the ancestors of `role_id` to its subtree
+    """
+    ancestors = [ancestor for ancestor, _ in _ancestors(connection, closure, role_id)]
+    if not ancestors:
+        return
+    subtree = [descendant for descendant, _ in _subtree(connection, closure, role_id)]
+    connection.execute(
+        delete(closure)
+        .where(closure.c.fsr_ancestor_id.in_(ancestors))
+        .where(closure.c.fsr_descendant_id.in_(subtree))
+    )
+
+
+def _attach(connection: Connection, closure, target: RoleMixin) -> None:
+    """
+    Adds the paths from `target.fsr_parent_id` and its ancestors to the subtree
+    of `target`
+    """
+    role_id, parent_id = target.fsr_role_id, target.fsr_parent_id
+    Role = _model("roleModel")
+    project_id = connection.execute(
+        select(Role.fsr_project_id).where(Role.fsr_role_id == parent_id)
+    ).scalar()
+    if project_id != target.fsr_project_id:
+        raise ValueError(
+            f"Role {target.fsr_role_name!r} and its parent must belong to the same project"
+        )
+    subtree = _subtree(connection, closure, role_id)
+    if any(descendant == parent_id for descendant, _ in subtree):
+        raise ValueError(
+            f"Making role {parent_id} the parent of role {role_id} creates a cycle"
+        )
+    ancestors = [(parent_id, 0)] + _ancestors(connection, closure, parent_id)
+    connection.execute(
+        insert(closure),
+        [
+            {
+                "fsr_ancestor_id": ancestor,
+                "fsr_descendant_id": descendant,
+                "fsr_depth": above + below + 1,
+            }
+            for ancestor, above in ancestors
+            for descendant, below in subtree
+        ],
+    )
+
+
+def _on_role_insert(mapper, connection, target) -> None:
+    Closure = _closure_model()
+    if Closure is not None and target.fsr_parent_id is not None:
+        _attach(connection, Closure.__table__, target)
+
+
+def _on_role_update(mapper, connection, target) -> None:
+    Closure = _closure_model()
+    if Closure is None:
+        return
+    if not inspect(target).attrs.fsr_parent_id.history.has_changes():
+        return
+    _detach(connection, Closure.__table__, target.fsr_role_id)
+    if target.fsr_parent_id is not None:
+        _attach(connection, Closure.__table__, target)
+
+
+def _on_role_delete(mapper, connection, target) -> None:
+    Closure = _closure_model()
+    if Closure is None:
+        return
+    closure = Closure.__table__
+    _detach(connection, closure, target.fsr_role_id)
+    # Its former children become roots, as `fsr_parent_id` is set to NULL
+    connection.execute(
+        delete(closure).where(closure.c.fsr_ancestor_id == target.fsr_role_id)
+    )
+
+
+event.listen(RoleMixin, "after_insert", _on_role_insert, propagate=True)
+event.listen(RoleMixin, "after_update", _on_role_update, propagate=True)
+event.listen(RoleMixin, "after_delete", _on_role_delete, propagate=True)
+
+
+def rebuild_role_closure(session: Session) -> int:
+    """
+    Recomputes the whole role closure from `RoleMixin.fsr_parent_id`, e.g.
+    after bulk statements that bypassed the mapper events or when adopting the
+    hierarchy on existing data. The caller commits the session.
+
+    :return: The number of closure rows
+    :rtype: int
+    """
+    Closure = _closure_model()
+    if Closure is None:
+        raise ValueError(
+            "The role hierarchy is disabled, set `fsr_hierarchy` on the role "
+            "model and map a model derived from RoleClosureMixin"
+        )
+    Role = _model("roleModel")
+    parents = dict(session.execute(select(Role.fsr_role_id, Role.fsr_parent_id)).all())
+    rows = []
+    for role_id in parents:
+        parent_id, depth, seen = parents[role_id], 1, {role_id}
+        while parent_id is not None and parent_id not in seen:
+            rows.append(
+                {
+                    "fsr_ancestor_id": parent_id,
+                    "fsr_descendant_id": role_id,
+                    "fsr_depth": depth,
+                }
+            )
+            seen.add(parent_id)
+            parent_id, depth = parents.get(parent_id), depth + 1
+    session.execute(delete(Closure))
+    if rows:
+        session.execute(insert(Closure), rows)
+    _changed(session, {EVERYONE})
+    return len(rows)
@@ -0,0 +1,152 @@
+import bisect
+import threading
+import typing as t
+from flask import Flask, Response
+from .signals import authorization_checked
+
+__all__ = ["PrometheusCollector"]
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# (check, project, endpoint)
+_Labels = t.Tuple[str, str, str]
+
+
+def _escape(value: t.Optional[str]) -> str:
+    value = "" if value is None else str(value)
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: _Labels, **extra: str) -> str:
+    check, project, endpoint = labels
+    pairs = [("check", check), ("project", project), ("endpoint", endpoint)]
+    pairs.extend(extra.items())
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+class PrometheusCollector:
+    """
+    Aggregates `authorization_checked` into counters and a latency histogram,
+    rendered in the Prometheus text exposition format. It has no dependency
+    on `prometheus_client`.
+
+    >>> collector = PrometheusCollector()
+    >>> collector.init_app(app)  # serves /metrics
+
+    :param buckets: Upper bounds in seconds of the latency histogram buckets
+    :type buckets: Sequence[float]
+    """
+
+    def __init__(
+        self,
+        app: t.Optional[Flask] = None,
+        buckets: t.Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._decisions: t.Dict[t.Tuple[_Labels, bool], int] = {}
+        self._queries: t.Dict[_Labels, int] = {}
+        self._cached: t.Dict[_Labels, int] = {}
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._durations: t.Dict[_Labels, t.List[float]] = {}
+        authorization_checked.connect(self._record)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask, path: t.Optional[str] = "/metrics") -> None:
+        """
+        Registers the endpoint `fsr_metrics` serving `render()` on `path`.
+        Pass `path=None` to only collect, e.g. to serve the metrics elsewhere.
+        """
+        if path is not None:
+            app.add_url_rule(path, "fsr_metrics", self._response)
+
+    def disconnect(self) -> None:
+        """
+        Stops collecting
+        """
+        authorization_checked.disconnect(self._record)
+
+    def _record(
+        self,
+        sender: Flask,
+        check: str,
+        project: t.Optional[str],
+        endpoint: t.Optional[str],
+        allowed: bool,
+        elapsed: float,
+        queries: int,
+        cached: bool,
+        **kwargs,
+    ) -> None:
+        labels = (check, project or "", endpoint or "")
+        with self._lock:
+            key = (labels, allowed)
+            self._decisions[key] = self._decisions.get(key, 0) + 1
+            self._queries[labels] = self._queries.get(labels, 0) + queries
+            self._cached[labels] = self._cached.get(labels, 0) + cached
+            duration = self._durations.get(labels)
+            if duration is None:
+                duration = self._durations[labels] = [0] * (len(self.buckets) + 2)
+            duration[bisect.bisect_left(self.buckets, elapsed)] += 1
+            duration[-1] += elapsed
+
+    def render(self) -> str:
+        """
+        The collected metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            decisions = sorted(self._decisions.items())
+            queries = sorted(self._queries.items())
+            cached = sorted(self._cached.items())
+            durations = sorted((k, list(v)) for k, v in self._durations.items())
+        lines = [
+            "# HELP fsr_authorization_checks_total Authorization checks by decision.",
+            "# TYPE fsr_authorization_checks_total counter",
+        ]
+        for (labels, allowed), count in decisions:
+            decision = "allowed" if allowed else "denied"
+            lines.append(
+                f"fsr_authorization_checks_total{{{_labels(labels, decision=decision)}}}"
+                f" {count}"
+            )
+        lines += [
+            "# HELP fsr_authorization_queries_total SQL statements issued by checks.",
+            "# TYPE fsr_authorization_queries_total counter",
+        ]
+        for labels, count in queries:
+            lines.append(
+                f"fsr_authorization_queries_total{{{_labels(labels)}}} {count}"
+            )
+        lines += [
+            "# HELP fsr_authorization_cached_total Checks answered without building "
+            "authorization data from the database.",
+            "# TYPE fsr_authorization_cached_total counter",
+        ]
+        for labels, count in cached:
+            lines.append(f"fsr_authorization_cached_total{{{_labels(labels)}}} {count}")
+        lines += [
+            "# HELP fsr_authorization_duration_seconds Duration of checks.",
+            "# TYPE fsr_authorization_duration_seconds histogram",
+        ]
+        for labels, duration in durations:
+            cumulative = 0
+            bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, duration):
+                cumulative += count
+                lines.append(
+                    "fsr_authorization_duration_seconds_bucket"
+                    f"{{{_labels(labels, le=bound)}}} {cumulative}"
+                )
+            lines.append(
+                f"fsr_authorization_duration_seconds_sum{{{_labels(labels)}}}"
+                f" {duration[-1]!r}"
+            )
+            lines.append(
+                f"fsr_authorization_duration_seconds_count{{{_labels(labels)}}}"
+                f" {cumulative}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def _response(self) -> Response:
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -1,13 +1,22 @@
+import threading
+import time
 import typing as t
+from collections import OrderedDict
 from sqlalchemy import (
     Column,
     Integer,
     String,
     ForeignKey,
+    Index,
     UniqueConstraint,
+    event,
+    or_,
+    select,
+    union,
 )
-from sqlalchemy.orm import relationship, declared_attr
+from sqlalchemy.orm import Session, relationship, declared_attr, object_session
 from .config import config
+from .errors import MisconfigurationError
 
 __all__ = [
     "UserMixin",
@@ -16,6 +25,8 @@ __all__ = [
     "PermissionMixin",
     "UserRoleMixin",
     "RolePermissionMixin",
+    "RoleClosureMixin",
+    "RBACVersionMixin",
 ]
 
 
@@ -42,47 +53,169 @@ class UserMixin:
         """
         return str(self.fsr_user_id)
 
-    def roles(self, project_id=None, project_name=None) -> t.List[str]:
+    def project_roles(self) -> t.List[t.Tuple[t.Optional[str], str]]:
         """
-        Roles of the user in the project with id `project_id`
+        (project name, role name) pairs of all the roles of the user,
+        fetched with a single joined query. Global roles have no project name.
+
+        :return: List of (project name, role name) pairs
+        :rtype: List[Tuple[Optional[str], str]]
+        """
+        session = object_session(self)
+        if session is None:
+            return [
+                (_project_name(role), str(role.name())) for role in self._walk_roles()
+            ]
+        stmt = _user_roles_query(self.fsr_user_id)
+        return [
+            (None if project is None else str(project), str(role))
+            for project, role in session.execute(stmt)
+        ]
+
+    def project_permissions(self) -> t.List[t.Tuple[t.Optional[str], str]]:
+        """
+        (project name, permission name) pairs of every permission granted to the
+        user through its roles, fetched with a single joined query. Permissions
+        of global roles have no project name.
+
+        :return: List of (project name, permission name) pairs
+        :rtype: List[Tuple[Optional[str], str]]
+        """
+        session = object_session(self)
+        if session is None:
+            return [
+                (
+                    _project_name(user_role.fsr_role),
+                    str(role_permission.fsr_permission.name()),
+                )
+                for user_role in self.fsr_roles
+                for role_permission in user_role.fsr_role.fsr_permissions
+            ]
+        stmt = _user_permissions_query(self.fsr_user_id)
+        return [
+            (None if project is None else str(project), str(perm))
+            for project, perm in session.execute(stmt)
+        ]
+
+    def roles(self, project_id=None, project_name=None, eager=False) -> t.List[str]:
+        """
+        Roles of the user in the project with id `project_id`, global roles
+        included
 
         :param project_id: Project ID of the project whose roles are needed
         :param project_name: Project name whose roles are needed
+        :param eager: Fetch the roles with a single joined query instead of
+            walking the lazy relationships
         :return: List of the roles
         :rtype: List[str]
         """
+        session = object_session(self)
+        if project_name is not None and project_id is None and session is not None:
+            project_id = _project_ids.cached(session, project_name)
+            if project_id is None and not eager:
+                project_id = _project_ids.get(session, project_name)
+                if project_id is None:
+                    # No such project, only the global roles apply
+                    return [
+                        str(role.name())
+                        for role in self._walk_roles()
+                        if role.fsr_project_id is None
+                    ]
+        if eager and session is not None:
+            Role, Project = _model("roleModel"), _model("projectModel")
+            held = _held_roles(lambda column: column == self.fsr_user_id)
+            stmt = (
+                select(Role.fsr_project_id, Role.fsr_role_name)
+                .select_from(held)
+                .join(Role, held.c.fsr_role_id == Role.fsr_role_id)
+            )
+            if project_id is not None:
+                stmt = stmt.where(
+                    or_(
+                        Role.fsr_project_id == project_id,
+                        Role.fsr_project_id.is_(None),
+                    )
+                )
+            elif project_name is not None:
+                # Not interned yet, filter by name and intern the ID found
+                stmt = stmt.outerjoin(
+                    Project, Role.fsr_project_id == Project.fsr_project_id
+                ).where(
+                    or_(
+                        Project.fsr_project_name == project_name,
+                        Role.fsr_project_id.is_(None),
+                    )
+                )
+            generation = _project_ids.generation
+            rows = session.execute(stmt).all()
+            if project_id is None and project_name is not None:
+                for row_project_id, _ in rows:
+                    if row_project_id is not None:
+                        _project_ids.add(
+                            session, project_name, row_project_id, generation
+                        )
+                        break
+            return [str(role) for _, role in rows]
         roles_list = []
         if project_id is None and project_name is None:
-            for user_role in self.fsr_roles:
-                roles_list.append(str(user_role.fsr_role.name()))
+            for role in self._walk_roles():
+                roles_list.append(str(role.name()))
         elif project_id is not None:
-            for user_role in self.fsr_roles:
-                if user_role.fsr_role.fsr_project_id == project_id:
-                    roles_list.append(str(user_role.fsr_role.name()))
+            for role in self._walk_roles():
+                if role.fsr_project_id in (project_id, None):
+                    roles_list.append(str(role.name()))
         elif project_name is not None:
-            for user_role in self.fsr_roles:
-                if user_role.fsr_role.fsr_project.name() == project_name:
-                    roles_list.append(str(user_role.fsr_role.name()))
+            for role in self._walk_roles():
+                if _project_name(role) in (project_name, None):
+                    roles_list.append(str(role.name()))
         return roles_list
 
-    def projects(self) -> t.List[str]:
+    def _walk_roles(self) -> t.Iterator[t.Any]:
+        """
+        Role objects held by the user, directly or implied by the role hierarchy,
+        through the lazy relationships
         """
-        Retrieve a list of projects associated with the user.
+        held = [user_role.fsr_role for user_role in self.fsr_roles]
+        seen = set()
+        for role in [*held, *_implied_roles(object_session(self), held)]:
+            if role.fsr_role_id not in seen:
+                seen.add(role.fsr_role_id)
+                yield role
+
+    def projects(self, eager=False) -> t.List[str]:
+        """
+        Retrieve a list of projects associated with the user, each listed once
+        however many roles the user has in it.
+        Global roles are not tied to a project and are left out.
 
+        :param eager: Fetch the projects with a single joined query instead of
+            walking the lazy relationships
         :return: A list of project names associated with the user.
         :rtype: List[str]
         """
-        project_list = []
-        for user_role in self.fsr_roles:
-            project_list.append(str(user_role.fsr_role.fsr_project.name()))
-        return project_list
+        if eager:
+            names = (project for project, _ in self.project_roles())
+        else:
+            names = (
+                (
+                    str(user_role.fsr_role.fsr_project.name())
+                    if user_role.fsr_role.fsr_project is not None
+                    else None
+                )
+                for user_role in self.fsr_roles
+            )
+        return [project for project in dict.fromkeys(names) if project is not None]
 
 
 class RoleMixin:
     """
-    Mixin for the `Role` model
+    Mixin for the `Role` model. A role without a project is global, its holders
+    have it in every project.
     """
 
+    # Set to `True` on the model to add `fsr_parent_id` and the role hierarchy
+    fsr_hierarchy = False
+
     @declared_attr
     def fsr_role_id(cls):
         return Column(
@@ -99,12 +232,39 @@ class RoleMixin:
             Integer, ForeignKey(f"{config.fsr_tables['projectModel']}.fsr_project_id")
         )
 
+    @declared_attr
+    def fsr_parent_id(cls):
+        if not cls.fsr_hierarchy:
+            return None
+        return Column(
+            Integer,
+            ForeignKey(
+                f"{config.fsr_tables['roleModel']}.fsr_role_id", ondelete="SET NULL"
+            ),
+        )
+
     @declared_attr
     def fsr_project(cls):
         return relationship(
             config.fsr_models["projectModel"], back_populates="fsr_roles"
         )
 
+    @declared_attr
+    def fsr_parent(cls):
+        if not cls.fsr_hierarchy:
+            return None
+        return relationship(
+            config.fsr_models["roleModel"],
+            remote_side=f"{config.fsr_models['roleModel']}.fsr_role_id",
+            back_populates="fsr_children",
+        )
+
+    @declared_attr
+    def fsr_children(cls):
+        if not cls.fsr_hierarchy:
+            return None
+        return relationship(config.fsr_models["roleModel"], back_populates="fsr_parent")
+
     @declared_attr
     def fsr_users(cls):
         return relationship(
@@ -117,23 +277,133 @@ class RoleMixin:
             config.fsr_models["rolepermissionModel"], back_populates="fsr_role"
         )
 
+    # Set to `False` on the model to skip the secondary indexes
+    fsr_indexes = True
+
     @declared_attr
     def __table_args__(cls):
-        return (UniqueConstraint("fsr_role_name", "fsr_project_id"),)
+        if not cls.fsr_indexes:
+            return (UniqueConstraint("fsr_role_name", "fsr_project_id"),)
+        indexes = (
+            UniqueConstraint("fsr_role_name", "fsr_project_id"),
+            # Roles of a project, and a role by name within a project
+            Index(
+                f"ix_{cls.__tablename__}_fsr_project_id",
+                "fsr_project_id",
+                "fsr_role_name",
+            ),
+        )
+        if cls.fsr_hierarchy:
+            # Children of a role in the hierarchy
+            indexes += (
+                Index(f"ix_{cls.__tablename__}_fsr_parent_id", "fsr_parent_id"),
+            )
+        return indexes
 
     def name(self) -> str:
         return str(self.fsr_role_name)
 
+    def implied_roles(self) -> t.List[t.Any]:
+        """
+        Roles implied by this role through the role hierarchy, nearest first.
+        Empty when no model derived from `RoleClosureMixin` is mapped or the
+        role is not attached to a session.
+
+        :return: Role model objects
+        """
+        return _implied_roles(object_session(self), [self])
+
+    def users(
+        self,
+        after: t.Optional[int] = None,
+        limit: t.Optional[int] = None,
+        stream: bool = False,
+        batch_size: int = 1000,
+    ) -> t.Iterable[t.Any]:
+        """
+        Users holding this role directly, ordered by user ID
+
+        :param after: Return only the users with an ID greater than this one,
+            the last ID of the previous page for keyset pagination
+        :param limit: Maximum number of users returned
+        :param stream: Return an iterator fetching `batch_size` rows at a time
+            instead of a list
+        :param batch_size: Rows fetched per batch when streaming
+        :return: User model objects
+        """
+        UserRole = _model("userroleModel")
+        holders = select(UserRole.fsr_user_id).where(
+            UserRole.fsr_role_id == self.fsr_role_id
+        )
+        return _users_page(
+            object_session(self), holders, after, limit, stream, batch_size
+        )
+
+    @classmethod
+    def users_with_role(
+        cls,
+        session: Session,
+        project_name: str,
+        role_name: str,
+        after: t.Optional[int] = None,
+        limit: t.Optional[int] = None,
+        stream: bool = False,
+        batch_size: int = 1000,
+    ) -> t.Iterable[t.Any]:
+        """
+        Users holding the role `role_name` in the project `project_name`
+        directly, ordered by user ID. Runs as a single statement.
+
+        :param session: Session used to run the query
+        :param project_name: Project name
+        :param role_name: Role name
+        :param after: Return only the users with an ID greater than this one,
+            the last ID of the previous page for keyset pagination
+        :param limit: Maximum number of users returned
+        :param stream: Return an iterator fetching `batch_size` rows at a time
+            instead of a list
+        :param batch_size: Rows fetched per batch when streaming
+        :return: User model objects
+        """
+        UserRole = _model("userroleModel")
+        Project = _model("projectModel")
+        holders = (
+            select(UserRole.fsr_user_id)
+            .join(cls, UserRole.fsr_role_id == cls.fsr_role_id)
+            .join(Project, cls.fsr_project_id == Project.fsr_project_id)
+            .where(Project.fsr_project_name == project_name)
+            .where(cls.fsr_role_name == role_name)
+        )
+        return _users_page(session, holders, after, limit, stream, batch_size)
+
     def has_permission(self, project_name, permission_name) -> bool:
         """
-        Checks if the role has `permission_name` permission in `project_name` project
+        Checks if the role has `permission_name` permission in `project_name`
+        project. A global role has its permissions in every project.
 
         :param project_name: Project name
         :param permission_name: Permission name
         :return: `True` if the role has permission in the project otherwise `False`
         :rtype: bool
         """
-        if self.fsr_project.fsr_project_name != project_name:
+        session = object_session(self)
+        if session is not None:
+            Role, Project = _model("roleModel"), _model("projectModel")
+            Permission = _model("permissionModel")
+            stmt = (
+                _permission_pairs_query()
+                .where(Role.fsr_role_id == self.fsr_role_id)
+                .where(
+                    or_(
+                        Project.fsr_project_name == project_name,
+                        Role.fsr_project_id.is_(None),
+                    )
+                )
+                .where(Permission.fsr_permission_name == permission_name)
+                .limit(1)
+            )
+            return session.execute(stmt).first() is not None
+        if _project_name(self) not in (project_name, None):
             return False
         for permission in self.fsr_permissions:
             if permission.fsr_permission.name() == permission_name:
@@ -168,6 +438,35 @@ class ProjectMixin:
         """
         return str(self.fsr_project_name)
 
+    def members(
+        self,
+        after: t.Optional[int] = None,
+        limit: t.Optional[int] = None,
+        stream: bool = False,
+        batch_size: int = 1000,
+    ) -> t.Iterable[t.Any]:
+        """
+        Users holding at least one role in the project, ordered by user ID.
+        Runs as a single statement.
+
+        :param after: Return only the users with an ID greater than this one,
+            the last ID of the previous page for keyset pagination
+        :param limit: Maximum number of users returned
+        :param stream: Return an iterator fetching `batch_size` rows at a time
+            instead of a list
+        :param batch_size: Rows fetched per batch when streaming
+        :return: User model objects
+        """
+        UserRole, Role = _model("userroleModel"), _model("roleModel")
+        holders = (
+            select(UserRole.fsr_user_id)
+            .join(Role, UserRole.fsr_role_id == Role.fsr_role_id)
+            .where(Role.fsr_project_id == self.fsr_project_id)
+        )
+        return _users_page(
+            object_session(self), holders, after, limit, stream, batch_size
+        )
+
 
 class PermissionMixin:
     @declared_attr
@@ -191,6 +490,18 @@ class PermissionMixin:
 
 
 class UserRoleMixin:
+    # Set to `False` on the model to skip the secondary indexes
+    fsr_indexes = True
+
+    @declared_attr
+    def __table_args__(cls):
+        if not cls.fsr_indexes:
+            return ()
+        # Roles of a user, the primary key leads with the role
+        return (
+            Index(f"ix_{cls.__tablename__}_fsr_user_id", "fsr_user_id", "fsr_role_id"),
+        )
+
     @declared_attr
     def fsr_role_id(cls):
         return Column(
@@ -217,6 +528,22 @@ class UserRoleMixin:
 
 
 class RolePermissionMixin:
+    # Set to `False` on the model to skip the secondary indexes
+    fsr_indexes = True
+
+    @declared_attr
+    def __table_args__(cls):
+        if not cls.fsr_indexes:
+            return ()
+        # Roles granting a permission, the primary key leads with the role
+        return (
+            Index(
+                f"ix_{cls.__tablename__}_fsr_permission_id",
+                "fsr_permission_id",
+                "fsr_role_id",
+            ),
+        )
+
     @declared_attr
     def fsr_role_id(cls):
         return Column(
@@ -244,3 +571,340 @@ class RolePermissionMixin:
         return relationship(
             config.fsr_models["permissionModel"], back_populates="fsr_roles"
         )
+
+
+class RoleClosureMixin:
+    """
+    Mixin for the `RoleClosure` model, the transitive closure of the role
+    hierarchy. A row states that holding the role `fsr_ancestor_id` implies the
+    role `fsr_descendant_id`, `fsr_depth` levels below it. The extension keeps
+    it up to date whenever `RoleMixin.fsr_parent_id` changes. The hierarchy is
+    disabled unless the role model sets `fsr_hierarchy` and a model derived
+    from this mixin is mapped.
+    """
+
+    # Set to `False` on the model to skip the secondary indexes
+    fsr_indexes = True
+
+    @declared_attr
+    def __table_args__(cls):
+        if not cls.fsr_indexes:
+            return ()
+        # Ancestors of a role, the primary key leads with the ancestor
+        return (
+            Index(
+                f"ix_{cls.__tablename__}_fsr_descendant_id",
+                "fsr_descendant_id",
+                "fsr_ancestor_id",
+            ),
+        )
+
+    @declared_attr
+    def fsr_ancestor_id(cls):
+        return Column(
+            Integer,
+            ForeignKey(
+                f"{config.fsr_tables['roleModel']}.fsr_role_id", ondelete="CASCADE"
+            ),
+            primary_key=True,
+        )
+
+    @declared_attr
+    def fsr_descendant_id(cls):
+        return Column(
+            Integer,
+            ForeignKey(
+                f"{config.fsr_tables['roleModel']}.fsr_role_id", ondelete="CASCADE"
+            ),
+            primary_key=True,
+        )
+
+    @declared_attr
+    def fsr_depth(cls):
+        return Column(Integer, nullable=False)
+
+
+class RBACVersionMixin:
+    """
+    Mixin for the `RBACVersion` model, which lets processes notice the changes
+    to the authorization models made by other processes. The row of
+    `fsr_scope_id` 0 holds a counter moved by every change, the row of -1 the
+    version of the last change affecting every user, and the row of a user ID
+    the version of the last change to the roles of that user. No version is
+    recorded while no model derived from this mixin is mapped.
+    """
+
+    # Set to `False` on the model to skip the secondary indexes
+    fsr_indexes = True
+
+    @declared_attr
+    def __table_args__(cls):
+        if not cls.fsr_indexes:
+            return ()
+        # Scopes changed since a version
+        return (Index(f"ix_{cls.__tablename__}_fsr_version", "fsr_version"),)
+
+    @declared_attr
+    def fsr_scope_id(cls):
+        return Column(Integer, primary_key=True, autoincrement=False)
+
+    @declared_attr
+    def fsr_version(cls):
+        return Column(Integer, nullable=False)
+
+
+_MODEL_MIXINS = {
+    "userModel": UserMixin,
+    "projectModel": ProjectMixin,
+    "roleModel": RoleMixin,
+    "permissionModel": PermissionMixin,
+    "userroleModel": UserRoleMixin,
+    "rolepermissionModel": RolePermissionMixin,
+    "roleclosureModel": RoleClosureMixin,
+    "rbacversionModel": RBACVersionMixin,
+}
+
+
+def _model(key: str) -> type:
+    """
+    Resolves the mapped model class configured for `key` in `config.fsr_models`
+    """
+    name = config.fsr_models[key]
+    subclasses = list(_MODEL_MIXINS[key].__subclasses__())
+    while subclasses:
+        cls = subclasses.pop()
+        if cls.__name__ == name and hasattr(cls, "__mapper__"):
+            return cls
+        subclasses.extend(cls.__subclasses__())
+    raise MisconfigurationError(
+        f"No mapped model named `{name}` derived from {_MODEL_MIXINS[key].__name__} was found."
+    )
+
+
+def _project_name(role: RoleMixin) -> t.Optional[str]:
+    """
+    Project name of `role` through the lazy relationship, `None` for a global role
+    """
+    project = role.fsr_project
+    return None if project is None else str(project.name())
+
+
+def _closure_model() -> t.Optional[type]:
+    """
+    The mapped model derived from `RoleClosureMixin`, `None` when the role
+    hierarchy is not used
+    """
+    try:
+        if not _model("roleModel").fsr_hierarchy:
+            return None
+        return _model("roleclosureModel")
+    except MisconfigurationError:
+        return None
+
+
+def _implied_roles(session: t.Optional[Session], roles: t.List[t.Any]) -> t.List[t.Any]:
+    """
+    Roles implied by any of `roles` through the role hierarchy, nearest first,
+    fetched with a single query
+    """
+    Closure = _closure_model()
+    if session is None or Closure is None or not roles:
+        return []
+    Role = _model("roleModel")
+    stmt = (
+        select(Role)
+        .join(Closure, Closure.fsr_descendant_id == Role.fsr_role_id)
+        .where(Closure.fsr_ancestor_id.in_({role.fsr_role_id for role in roles}))
+        .order_by(Closure.fsr_depth, Role.fsr_role_id)
+    )
+    # A role implied by several of `roles` comes back once per path
+    return list(dict.fromkeys(session.scalars(stmt)))
+
+
+def _held_roles(user_filter: t.Callable[[t.Any], t.Any]):
+    """
+    Subquery of the (fsr_user_id, fsr_role_id) pairs of the roles held by the
+    users matched by `user_filter(UserRole.fsr_user_id)`, directly or implied
+    through the role closure
+    """
+    UserRole = _model("userroleModel")
+    direct = select(UserRole.fsr_user_id, UserRole.fsr_role_id).where(
+        user_filter(UserRole.fsr_user_id)
+    )
+    Closure = _closure_model()
+    if Closure is None:
+        return direct.subquery("fsr_held_roles")
+    implied = (
+        select(UserRole.fsr_user_id, Closure.fsr_descendant_id)
+        .join(Closure, Closure.fsr_ancestor_id == UserRole.fsr_role_id)
+        .where(user_filter(UserRole.fsr_user_id))
+    )
+    return union(direct, implied).subquery("fsr_held_roles")
+
+
+def _role_pairs_query(held):
+    """
+    SELECT of (project name, role name) over the `_held_roles` subquery `held`
+    -> Role -> Project, with a `None` project name for global roles.
+    Callers narrow it down with `where` clauses on the models.
+    """
+    Role = _model("roleModel")
+    Project = _model("projectModel")
+    return (
+        select(Project.fsr_project_name, Role.fsr_role_name)
+        .select_from(held)
+        .join(Role, held.c.fsr_role_id == Role.fsr_role_id)
+        .outerjoin(Project, Role.fsr_project_id == Project.fsr_project_id)
+    )
+
+
+def _permission_pairs_query():
+    """
+    SELECT of (project name, permission name) over Role -> RolePermission ->
+    Permission and Role -> Project, with a `None` project name for global roles.
+    Callers narrow it down with `where` clauses on these models.
+    """
+    Role = _model("roleModel")
+    RolePermission = _model("rolepermissionModel")
+    Permission = _model("permissionModel")
+    Project = _model("projectModel")
+    return (
+        select(Project.fsr_project_name, Permission.fsr_permission_name)
+        .select_from(Role)
+        .outerjoin(Project, Role.fsr_project_id == Project.fsr_project_id)
+        .join(RolePermission, RolePermission.fsr_role_id == Role.fsr_role_id)
+        .join(
+            Permission,
+            Permission.fsr_permission_id == RolePermission.fsr_permission_id,
+        )
+    )
+
+
+def _users_page(
+    session: Session,
+    holders,
+    after: t.Optional[int],
+    limit: t.Optional[int],
+    stream: bool,
+    batch_size: int,
+) -> t.Iterable[t.Any]:
+    """
+    Users whose ID is returned by the `holders` subquery, one keyset page at a time
+    """
+    User = _model("userModel")
+    stmt = select(User).where(User.fsr_user_id.in_(holders))
+    if after is not None:
+        stmt = stmt.where(User.fsr_user_id > after)
+    stmt = stmt.order_by(User.fsr_user_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if stream:
+        return session.scalars(stmt.execution_options(yield_per=batch_size))
+    return list(session.scalars(stmt))
+
+
+def _user_roles_query(user_id: int):
+    """
+    SELECT of the (project name, role name) pairs of the user `user_id`,
+    implied roles included
+    """
+    return _role_pairs_query(_held_roles(lambda column: column == user_id))
+
+
+def _user_permissions_query(user_id: int):
+    """
+    SELECT of the distinct (project name, permission name) pairs granted to
+    the user `user_id` through its roles, implied roles included
+    """
+    Role = _model("roleModel")
+    held = _held_roles(lambda column: column == user_id)
+    return (
+        _permission_pairs_query()
+        .join(held, held.c.fsr_role_id == Role.fsr_role_id)
+        .distinct()
+    )
+
+
+class _ProjectIds:
+    """
+    Bounded LRU map of the project names of each database to project IDs, so
+    that role lookups by project name filter on `fsr_project_id` without
+    joining or loading projects. Entries expire after `ttl` seconds, and the
+    map is cleared whenever a project is inserted, updated or deleted by this
+    process, or by another one as seen through `FSR_RBAC_VERSION`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: t.Optional[float] = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._ids: "OrderedDict[t.Tuple[t.Any, str], t.Tuple[float, int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    @staticmethod
+    def _key(session: Session, name: str) -> t.Tuple[t.Any, str]:
+        return session.get_bind(mapper=_model("projectModel")), name
+
+    def cached(self, session: Session, name: str) -> t.Optional[int]:
+        key = self._key(session, name)
+        with self._lock:
+            entry = self._ids.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._ids[key]
+                return None
+            self._ids.move_to_end(key)
+            return entry[1]
+
+    def get(self, session: Session, name: str) -> t.Optional[int]:
+        """
+        ID of the project named `name`, `None` if there is no such project
+        """
+        project_id = self.cached(session, name)
+        if project_id is not None:
+            return project_id
+        generation = self.generation
+        Project = _model("projectModel")
+        project_id = session.scalar(
+            select(Project.fsr_project_id).where(Project.fsr_project_name == name)
+        )
+        if project_id is not None:
+            self.add(session, name, project_id, generation)
+        return project_id
+
+    def add(
+        self,
+        session: Session,
+        name: str,
+        project_id: int,
+        generation: t.Optional[int] = None,
+    ) -> None:
+        key = self._key(session, name)
+        expires = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            # Skip IDs read before a concurrent clear
+            if generation is not None and generation != self.generation:
+                return
+            self._ids[key] = (expires, project_id)
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._ids.clear()
+
+
+_project_ids = _ProjectIds()
+
+
+def _on_project_change(mapper, connection, target) -> None:
+    _project_ids.clear()
+
+
+for _identifier in ("after_insert", "after_update", "after_delete"):
+    event.listen(ProjectMixin, _identifier, _on_project_change, propagate=True)
@@ -0,0 +1,125 @@
+import typing as t
+from .bitmask import RoleBits
+
+__all__ = ["Policy", "Role", "AllOf", "AnyOf", "Not"]
+
+# Returns the role bitmask of the current user in a project, or `None` if the
+# user has no role in it.
+MaskGetter = t.Callable[[str], t.Union[int, None]]
+Check = t.Callable[[MaskGetter], bool]
+
+
+class Policy:
+    """
+    Base class of the policy expressions. Expressions are combined with
+    `&` (all of), `|` (any of) and `~` (not), e.g.
+
+    .. code-block:: python
+
+        (Role("A", "admin") | Role("A", "editor")) & ~Role("B", "suspended")
+    """
+
+    def __and__(self, other: "Policy") -> "Policy":
+        return AllOf(self, other)
+
+    def __or__(self, other: "Policy") -> "Policy":
+        return AnyOf(self, other)
+
+    def __invert__(self) -> "Policy":
+        return Not(self)
+
+    def compile(self, bits: RoleBits) -> Check:
+        """
+        Compiles the expression into a function of the user's role masks.
+        Operands are evaluated left to right and short-circuit.
+
+        :param bits: Role id registry the masks are built with
+        """
+        raise NotImplementedError
+
+
+class Role(Policy):
+    """
+    Satisfied when the user has `role` in `project`
+    """
+
+    def __init__(self, project: str, role: str) -> None:
+        self.project = project
+        self.role = role
+
+    def __repr__(self) -> str:
+        return f"Role({self.project!r}, {self.role!r})"
+
+    def compile(self, bits: RoleBits) -> Check:
+        project = self.project
+        bit = bits.mask(project, [self.role])
+
+        def check(mask_of: MaskGetter) -> bool:
+            mask = mask_of(project)
+            return mask is not None and mask & bit != 0
+
+        return check
+
+
+class _Operator(Policy):
+    symbol = ""
+
+    def __init__(self, *operands: Policy) -> None:
+        flattened: t.List[Policy] = []
+        for operand in operands:
+            if not isinstance(operand, Policy):
+                raise TypeError(
+                    f"Expected a Policy operand, but received a {type(operand).__name__}."
+                )
+            if type(operand) is type(self):
+                flattened.extend(operand.operands)
+            else:
+                flattened.append(operand)
+        self.operands = tuple(flattened)
+
+    def __repr__(self) -> str:
+        return "(" + f" {self.symbol} ".join(map(repr, self.operands)) + ")"
+
+
+class AllOf(_Operator):
+    """
+    Satisfied when every operand is satisfied
+    """
+
+    symbol = "&"
+
+    def compile(self, bits: RoleBits) -> Check:
+        checks = [operand.compile(bits) for operand in self.operands]
+        return lambda mask_of: all(check(mask_of) for check in checks)
+
+
+class AnyOf(_Operator):
+    """
+    Satisfied when at least one operand is satisfied
+    """
+
+    symbol = "|"
+
+    def compile(self, bits: RoleBits) -> Check:
+        checks = [operand.compile(bits) for operand in self.operands]
+        return lambda mask_of: any(check(mask_of) for check in checks)
+
+
+class Not(Policy):
+    """
+    Satisfied when the operand is not satisfied
+    """
+
+    def __init__(self, operand: Policy) -> None:
+        if not isinstance(operand, Policy):
+            raise TypeError(
+                f"Expected a Policy operand, but received a {type(operand).__name__}."
+            )
+        self.operand = operand
+
+    def __repr__(self) -> str:
+        return f"~{self.operand!r}"
+
+    def compile(self, bits: RoleBits) -> Check:
+        check = self.operand.compile(bits)
+        return lambda mask_of: not check(mask_of)
@@ -0,0 +1,38 @@
+import typing as t
+
+__all__ = ["Principal"]
+
+
+class Principal:
+    """
+    Identity of a user without its model object. Passed to `user_loader`, it
+    lets the authorization checks run from the user ID alone, while the model
+    object is only loaded once the view touches `current_user`.
+
+    :param fsr_user_id: User ID of the user
+    """
+
+    __slots__ = ("fsr_user_id",)
+
+    def __init__(self, fsr_user_id: t.Union[int, str]) -> None:
+        object.__setattr__(self, "fsr_user_id", int(fsr_user_id))
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Principal):
+            return NotImplemented
+        return self.fsr_user_id == other.fsr_user_id
+
+    def __hash__(self) -> int:
+        return hash(self.fsr_user_id)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.fsr_user_id!r})"
+
+    def user_id(self) -> str:
+        """
+        User ID of the user
+        """
+        return str(self.fsr_user_id)
@@ -0,0 +1,214 @@
+import typing as t
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from .changes import _changed
+from .models import UserMixin, _model
+
+__all__ = ["grant", "revoke", "sync_roles"]
+
+# (user ID, role name) pairs
+Changes = t.List[t.Tuple[int, str]]
+UserRef = t.Union[UserMixin, int, str]
+
+
+def _user_ids(users: t.Iterable[UserRef]) -> t.List[int]:
+    ids = {}
+    for user in users:
+        user_id = int(user.fsr_user_id if isinstance(user, UserMixin) else user)
+        ids[user_id] = None
+    return list(ids)
+
+
+def _in_project(stmt, project: t.Optional[str]):
+    """
+    Narrows `stmt`, selecting from Role, down to the roles of `project`, or to
+    the global roles when `project` is `None`
+    """
+    Role, Project = _model("roleModel"), _model("projectModel")
+    if project is None:
+        return stmt.where(Role.fsr_project_id.is_(None))
+    return stmt.join(Project, Role.fsr_project_id == Project.fsr_project_id).where(
+        Project.fsr_project_name == project
+    )
+
+
+def _role_ids(
+    session: Session, project: t.Optional[str], roles: t.Iterable[str]
+) -> t.Dict[int, str]:
+    """
+    IDs of the roles named `roles` in `project`, mapped to their names
+    """
+    Role = _model("roleModel")
+    names = set(roles)
+    found = dict(
+        session.execute(
+            _in_project(
+                select(Role.fsr_role_id, Role.fsr_role_name).where(
+                    Role.fsr_role_name.in_(names)
+                ),
+                project,
+            )
+        ).all()
+    )
+    missing = names - set(found.values())
+    if missing:
+        where = "global roles" if project is None else f"roles in project {project!r}"
+        raise ValueError(f"Unknown {where}: {', '.join(sorted(missing))}")
+    return found
+
+
+def _existing(
+    session: Session, user_ids: t.List[int], role_ids: t.Iterable[int]
+) -> t.Set[t.Tuple[int, int]]:
+    UserRole = _model("userroleModel")
+    return set(
+        session.execute(
+            select(UserRole.fsr_user_id, UserRole.fsr_role_id)
+            .where(UserRole.fsr_user_id.in_(user_ids))
+            .where(UserRole.fsr_role_id.in_(list(role_ids)))
+        ).all()
+    )
+
+
+def _insert_ignore(
+    session: Session, rows: t.List[t.Dict[str, int]]
+) -> t.List[t.Tuple[int, int]]:
+    """
+    Inserts UserRole rows, skipping the ones created concurrently where the
+    database supports `ON CONFLICT DO NOTHING`
+
+    :return: The (user ID, role ID) pairs actually inserted
+    """
+    UserRole = _model("userroleModel")
+    table = UserRole.__table__
+    dialect = session.get_bind(mapper=UserRole).dialect
+    if dialect.name == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing()
+    elif dialect.name == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing()
+    else:
+        # Conflicts raise, so every row is inserted
+        session.execute(insert(table), rows)
+        return [(row["fsr_user_id"], row["fsr_role_id"]) for row in rows]
+    if not dialect.insert_returning:
+        session.execute(stmt, rows)
+        return [(row["fsr_user_id"], row["fsr_role_id"]) for row in rows]
+    return [
+        tuple(row)
+        for row in session.execute(
+            stmt.values(rows).returning(table.c.fsr_user_id, table.c.fsr_role_id)
+        )
+    ]
+
+
+def _invalidate(session: Session, user_ids: t.Iterable[int]) -> None:
+    """
+    Drops the cached authorization data of `user_ids` now, and again once the
+    transaction commits, and records their new version for the other
+    processes, since bulk statements do not emit mapper events
+    """
+    ids = {str(user_id) for user_id in user_ids}
+    if not ids:
+        return
+    _changed(session, ids)
+
+
+def grant(
+    session: Session,
+    users: t.Iterable[UserRef],
+    project: t.Optional[str],
+    roles: t.Iterable[str],
+    chunk_size: int = 500,
+) -> Changes:
+    """
+    Grants `roles` of `project`, or the global `roles` when `project` is `None`,
+    to every user in `users` with set based statements, `chunk_size` users at
+    a time. The caller commits the session.
+
+    :return: The (user ID, role name) pairs that were added
+    :rtype: List[Tuple[int, str]]
+    """
+    role_ids = _role_ids(session, project, roles)
+    user_ids = _user_ids(users)
+    added = []
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        existing = _existing(session, chunk, role_ids)
+        rows = [
+            {"fsr_user_id": user_id, "fsr_role_id": role_id}
+            for user_id in chunk
+            for role_id in role_ids
+            if (user_id, role_id) not in existing
+        ]
+        if rows:
+            inserted = _insert_ignore(session, rows)
+            added.extend((user_id, role_ids[role_id]) for user_id, role_id in inserted)
+    _invalidate(session, {user_id for user_id, _ in added})
+    return added
+
+
+def revoke(
+    session: Session,
+    users: t.Iterable[UserRef],
+    project: t.Optional[str],
+    roles: t.Iterable[str],
+    chunk_size: int = 500,
+) -> Changes:
+    """
+    Revokes `roles` of `project` from every user in `users` with set based
+    statements, `chunk_size` users at a time. The caller commits the session.
+
+    :return: The (user ID, role name) pairs that were removed
+    :rtype: List[Tuple[int, str]]
+    """
+    UserRole = _model("userroleModel")
+    role_ids = _role_ids(session, project, roles)
+    user_ids = _user_ids(users)
+    removed = []
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        existing = sorted(_existing(session, chunk, role_ids))
+        if existing:
+            session.execute(
+                delete(UserRole)
+                .where(UserRole.fsr_user_id.in_(chunk))
+                .where(UserRole.fsr_role_id.in_(list(role_ids)))
+            )
+        removed.extend((user_id, role_ids[role_id]) for user_id, role_id in existing)
+    _invalidate(session, {user_id for user_id, _ in removed})
+    return removed
+
+
+def sync_roles(
+    session: Session, user: UserRef, project: t.Optional[str], roles: t.Iterable[str]
+) -> t.Tuple[Changes, Changes]:
+    """
+    Makes `roles` the exact set of roles of `user` in `project`.
+    The caller commits the session.
+
+    :return: The (user ID, role name) pairs that were added and removed
+    :rtype: Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]
+    """
+    UserRole, Role = _model("userroleModel"), _model("roleModel")
+    (user_id,) = _user_ids([user])
+    wanted = set(roles)
+    current = set(
+        session.scalars(
+            _in_project(
+                select(Role.fsr_role_name)
+                .join(UserRole, UserRole.fsr_role_id == Role.fsr_role_id)
+                .where(UserRole.fsr_user_id == user_id),
+                project,
+            )
+        )
+    )
+    added = (
+        grant(session, [user_id], project, wanted - current) if wanted - current else []
+    )
+    removed = (
+        revoke(session, [user_id], project, current - wanted)
+        if current - wanted
+        else []
+    )
+    return added, removed
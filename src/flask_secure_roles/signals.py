@@ -0,0 +1,88 @@
+import time
+import typing as t
+from contextvars import ContextVar
+from blinker import Namespace
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+__all__ = ["authorization_checked"]
+
+_signals = Namespace()
+
+#: Sent after every check of an authorization decorator, with the app as
+#: sender and the keyword arguments
+#:
+#: - `check`: name of the decorator, e.g. "required_roles"
+#: - `project`: project name, `None` for `policy`
+#: - `endpoint`: endpoint of the request
+#: - `allowed`: decision of the check
+#: - `elapsed`: seconds spent in the check
+#: - `queries`: number of SQL statements issued by the check
+#: - `cached`: `True` if no authorization data had to be built from the database
+authorization_checked = _signals.signal("authorization-checked")
+
+_statements: ContextVar[t.Optional[t.List[int]]] = ContextVar(
+    "fsr_statements", default=None
+)
+_counting = False
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class _Measurement:
+    """
+    Measures one check, only created when `authorization_checked` has receivers
+    """
+
+    __slots__ = ("start", "elapsed", "builds", "counter", "token")
+
+    def __init__(self) -> None:
+        global _counting
+        if not _counting:
+            event.listen(Engine, "before_cursor_execute", _count_statement)
+            _counting = True
+        self.counter = [0]
+        self.token = _statements.set(self.counter)
+        self.builds = g.get("_fsr_builds", 0)
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def stop(self) -> None:
+        """
+        Ends the measurement. Must run even when the check raises, to stop
+        counting the statements of the context.
+        """
+        self.elapsed = time.perf_counter() - self.start
+        _statements.reset(self.token)
+
+    def report(self, check: str, project: t.Optional[str], allowed: bool) -> None:
+        authorization_checked.send(
+            current_app._get_current_object(),
+            check=check,
+            project=project,
+            endpoint=request.endpoint,
+            allowed=allowed,
+            elapsed=self.elapsed,
+            queries=self.counter[0],
+            cached=g.get("_fsr_builds", 0) == self.builds,
+        )
+
+
+def _measure(
+    check: str, project: t.Optional[str], allowed: t.Callable[[], bool]
+) -> bool:
+    """
+    Runs `allowed()` and reports its decision through `authorization_checked`
+    """
+    measurement = _Measurement()
+    try:
+        valid = allowed()
+    finally:
+        measurement.stop()
+    measurement.report(check, project, valid)
+    return valid
@@ -0,0 +1,184 @@
+import sys
+import typing as t
+from collections.abc import Mapping
+from .bitmask import RoleBits
+
+__all__ = ["Snapshot"]
+
+# Version of the binary layout, bumped whenever it changes
+FORMAT_VERSION = 1
+
+
+class Snapshot(Mapping):
+    """
+    Immutable authorization data of a user: a mapping of project name, `None`
+    for global roles, to the frozenset of role or permission names in it.
+    Names are interned, so the snapshots of many users share their strings.
+
+    Snapshots pickle through `to_bytes`, which keeps them small in caches and
+    when sent to process pools.
+
+    :param entries: Mapping of project name to names
+    """
+
+    __slots__ = ("_entries", "_masks")
+
+    def __init__(
+        self, entries: t.Optional[t.Mapping[t.Optional[str], t.Iterable[str]]] = None
+    ) -> None:
+        if entries is None:
+            entries = {}
+        object.__setattr__(
+            self,
+            "_entries",
+            {
+                _intern(project): frozenset(map(sys.intern, names))
+                for project, names in entries.items()
+            },
+        )
+        # Role masks by project, along with the RoleBits they were computed with
+        object.__setattr__(self, "_masks", None)
+
+    @classmethod
+    def from_pairs(cls, pairs: t.Iterable[t.Tuple[t.Optional[str], str]]) -> "Snapshot":
+        """
+        Groups (project name, name) pairs into a snapshot
+        """
+        index: t.Dict[t.Optional[str], t.Set[str]] = {}
+        for project, name in pairs:
+            key = None if project is None else str(project)
+            index.setdefault(key, set()).add(str(name))
+        return cls(index)
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, project: t.Optional[str]) -> t.FrozenSet[str]:
+        return self._entries[project]
+
+    def __iter__(self) -> t.Iterator[t.Optional[str]]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, project: object) -> bool:
+        return project in self._entries
+
+    def get(self, project: t.Optional[str], default: t.Any = None) -> t.Any:
+        return self._entries.get(project, default)
+
+    def items(self):
+        return self._entries.items()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Snapshot):
+            return self._entries == other._entries
+        if isinstance(other, Mapping):
+            return self._entries == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._entries!r})"
+
+    def __reduce__(self):
+        return (type(self).from_bytes, (self.to_bytes(),))
+
+    def mask(self, project: str, bits: RoleBits) -> t.Optional[int]:
+        """
+        Bitmask of the names in `project`, global ones included, or `None` if
+        there are none. Computed once per project and kept with the snapshot,
+        so snapshots reused across requests skip it.
+
+        :param project: Project name
+        :param bits: Role id registry the mask is built with
+        """
+        cached = self._masks
+        if cached is None or cached[0] is not bits:
+            cached = (bits, {})
+            object.__setattr__(self, "_masks", cached)
+        masks = cached[1]
+        if project not in masks:
+            global_names = self._entries.get(None)
+            names = self._entries.get(project)
+            if global_names is not None:
+                names = global_names if names is None else names | global_names
+            masks[project] = None if names is None else bits.mask(project, names)
+        return masks[project]
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form of the snapshot, read back by `from_bytes`.
+        Every name is written as a varint length followed by its UTF-8 bytes.
+        """
+        out = bytearray((FORMAT_VERSION,))
+        _write_uint(out, len(self._entries))
+        for project, names in self._entries.items():
+            if project is None:
+                _write_uint(out, 0)
+            else:
+                # Lengths of project names are shifted by one to leave 0 for None
+                _write_str(out, project, 1)
+            _write_uint(out, len(names))
+            for name in sorted(names):
+                _write_str(out, name, 0)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Snapshot":
+        """
+        Reads a snapshot written by `to_bytes`
+
+        :raises ValueError: If `data` is not a snapshot of the current format
+        """
+        if not data or data[0] != FORMAT_VERSION:
+            raise ValueError("Unsupported snapshot format")
+        try:
+            count, pos = _read_uint(data, 1)
+            entries: t.Dict[t.Optional[str], t.List[str]] = {}
+            for _ in range(count):
+                length, pos = _read_uint(data, pos)
+                project = None
+                if length:
+                    project = data[pos : pos + length - 1].decode("utf-8")
+                    pos += length - 1
+                size, pos = _read_uint(data, pos)
+                names = []
+                for _ in range(size):
+                    length, pos = _read_uint(data, pos)
+                    names.append(data[pos : pos + length].decode("utf-8"))
+                    pos += length
+                entries[project] = names
+        except (IndexError, UnicodeDecodeError):
+            raise ValueError("Truncated or corrupt snapshot")
+        if pos != len(data):
+            raise ValueError("Truncated or corrupt snapshot")
+        return cls(entries)
+
+
+def _intern(project: t.Optional[str]) -> t.Optional[str]:
+    return None if project is None else sys.intern(project)
+
+
+def _write_uint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_uint(data: bytes, pos: int) -> t.Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _write_str(out: bytearray, value: str, offset: int) -> None:
+    encoded = value.encode("utf-8")
+    _write_uint(out, len(encoded) + offset)
+    out += encoded
@@ -0,0 +1,71 @@
+import typing as t
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from .snapshot import Snapshot
+
+# Version of the claims payload, bumped whenever its layout changes
+CLAIMS_VERSION = 2
+
+_SALT = "flask-secure-roles.claims"
+
+
+class Claims(t.NamedTuple):
+    user_id: str
+    role_version: int
+    snapshot: Snapshot
+
+
+def _serializer(secret_key: str) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(secret_key, salt=_SALT)
+
+
+def dump_claims(
+    secret_key: str,
+    user_id: str,
+    role_version: int,
+    snapshot: t.Mapping[t.Optional[str], t.FrozenSet[str]],
+) -> str:
+    """
+    Signs the role snapshot of a user into a compact URL safe token
+
+    :param secret_key: Key used to sign the token
+    :param user_id: ID of the user the snapshot belongs to
+    :param role_version: Role version the snapshot was built in
+    :param snapshot: Mapping of project name, `None` for global roles, to role names
+    :return: The signed token
+    :rtype: str
+    """
+    return _serializer(secret_key).dumps(
+        {
+            "v": CLAIMS_VERSION,
+            "u": user_id,
+            "r": role_version,
+            # Pairs, as global roles have no project name to use as a key
+            "p": [[project, sorted(roles)] for project, roles in snapshot.items()],
+        }
+    )
+
+
+def load_claims(
+    secret_key: str, token: str, max_age: t.Optional[int] = None
+) -> t.Optional[Claims]:
+    """
+    Verifies a token created by `dump_claims`
+
+    :param secret_key: Key the token was signed with
+    :param token: The token
+    :param max_age: Maximum age of the token in seconds
+    :return: The claims, or `None` if the token is invalid, expired or of
+        another payload version
+    :rtype: Optional[Claims]
+    """
+    try:
+        payload = _serializer(secret_key).loads(token, max_age=max_age)
+    except BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("v") != CLAIMS_VERSION:
+        return None
+    return Claims(
+        user_id=payload["u"],
+        role_version=payload["r"],
+        snapshot=Snapshot(dict(payload["p"])),
+    )
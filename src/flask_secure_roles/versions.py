@@ -0,0 +1,162 @@
+import typing as t
+from sqlalchemy import Table, event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from .errors import MisconfigurationError
+from .models import _model
+
+__all__ = ["changes_since", "record"]
+
+# Scopes of the rows of the version model
+COUNTER = 0
+EVERYONE = -1
+
+
+def _version_model() -> t.Optional[type]:
+    """
+    The mapped model derived from `RBACVersionMixin`, `None` when versions are
+    not recorded
+    """
+    try:
+        return _model("rbacversionModel")
+    except MisconfigurationError:
+        return None
+
+
+def _connection(connection: t.Union[Connection, Session], Version: type) -> Connection:
+    """
+    Connection of `connection`, or of the bind of `Version` in a session
+    """
+    if isinstance(connection, Connection):
+        return connection
+    return connection.connection(bind_arguments={"mapper": Version})
+
+
+def _upsert(
+    connection: Connection,
+    table: Table,
+    rows: t.List[t.Dict[str, int]],
+    version: t.Any = None,
+):
+    """
+    INSERT of `rows` setting the version of the scopes that already exist to
+    `version`, by default the version of the row, `None` where the database
+    has no upsert
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    else:
+        return None
+    return stmt.values(rows).on_conflict_do_update(
+        index_elements=[table.c.fsr_scope_id],
+        set_={"fsr_version": stmt.excluded.fsr_version if version is None else version},
+    )
+
+
+def record(
+    connection: t.Union[Connection, Session],
+    user_ids: t.Optional[t.Iterable[t.Union[int, str]]],
+    chunk_size: int = 500,
+) -> t.Optional[int]:
+    """
+    Moves the version counter and stamps the users `user_ids`, or every user
+    when `None`, with the new version in the current transaction. The counter
+    row stays locked until the transaction ends, so versions are committed in
+    the order they are assigned.
+
+    :return: The new version, `None` when no model derived from
+        `RBACVersionMixin` is mapped
+    :rtype: Optional[int]
+    """
+    Version = _version_model()
+    if Version is None:
+        return None
+    scopes = [EVERYONE] if user_ids is None else sorted({int(u) for u in user_ids})
+    if not scopes:
+        return None
+    connection = _connection(connection, Version)
+    table = Version.__table__
+    scope, version = table.c.fsr_scope_id, table.c.fsr_version
+    counter = _upsert(
+        connection, table, [{"fsr_scope_id": COUNTER, "fsr_version": 1}], version + 1
+    )
+    if counter is not None:
+        connection.execute(counter)
+    else:
+        # The row is created along with the table, see `_seed_counter`
+        moved = connection.execute(
+            update(table).where(scope == COUNTER).values(fsr_version=version + 1)
+        )
+        if moved.rowcount == 0:
+            connection.execute(
+                insert(table).values(fsr_scope_id=COUNTER, fsr_version=1)
+            )
+    current = connection.execute(select(version).where(scope == COUNTER)).scalar_one()
+    for start in range(0, len(scopes), chunk_size):
+        chunk = scopes[start : start + chunk_size]
+        rows = [{"fsr_scope_id": value, "fsr_version": current} for value in chunk]
+        stmt = _upsert(connection, table, rows)
+        if stmt is not None:
+            connection.execute(stmt)
+            continue
+        existing = set(
+            connection.execute(select(scope).where(scope.in_(chunk))).scalars()
+        )
+        if existing:
+            connection.execute(
+                update(table).where(scope.in_(existing)).values(fsr_version=current)
+            )
+        missing = [value for value in chunk if value not in existing]
+        if missing:
+            connection.execute(
+                insert(table), [row for row in rows if row["fsr_scope_id"] in missing]
+            )
+    return current
+
+
+def _seed_counter(target: Table, connection: Connection, **kw) -> None:
+    # Concurrent transactions then only ever update the counter row
+    Version = _version_model()
+    if Version is not None and target is Version.__table__:
+        connection.execute(insert(target).values(fsr_scope_id=COUNTER, fsr_version=0))
+
+
+event.listen(Table, "after_create", _seed_counter)
+
+
+def changes_since(
+    connection: t.Union[Connection, Session], since: t.Optional[int]
+) -> t.Tuple[int, t.Optional[t.Set[str]]]:
+    """
+    Reads the current version with a primary key lookup, and the users changed
+    after the version `since` only when it moved.
+
+    :param since: Version read by the previous call, `None` on the first one
+    :return: The current version and the IDs of the users changed after
+        `since`, `None` when the change affects every user
+    :rtype: Tuple[int, Optional[Set[str]]]
+    """
+    Version = _version_model()
+    if Version is None:
+        raise MisconfigurationError(
+            "No mapped model derived from RBACVersionMixin was found."
+        )
+    connection = _connection(connection, Version)
+    table = Version.__table__
+    scope, version = table.c.fsr_scope_id, table.c.fsr_version
+    current = connection.execute(select(version).where(scope == COUNTER)).scalar()
+    current = current or 0
+    if since is None or current == since:
+        return current, set()
+    changed = set(
+        connection.execute(
+            select(scope).where(version > since).where(scope != COUNTER)
+        ).scalars()
+    )
+    if EVERYONE in changed:
+        return current, None
+    return current, {str(user_id) for user_id in changed}
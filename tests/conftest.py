@@ -2,7 +2,10 @@
 import pytest
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles import policy
 
 db = SQLAlchemy()
 
@@ -41,6 +44,31 @@ def app_instance():
     def mix_roles_test():
         return "works"
 
+    @app.route("/stacked-role")
+    @fsr.any_role("hello", ["admin", "pop"])
+    @fsr.required_roles("hello", ["admin"])
+    @fsr.forbid_roles("hello", ["pop"])
+    def stacked_roles_test():
+        return "works"
+
+    @app.route("/policy")
+    @fsr.policy(
+        (policy.Role("hello", "admin") | policy.Role("hello", "editor"))
+        & ~policy.Role("hello", "suspended")
+    )
+    def policy_test():
+        return "works"
+
+    @app.route("/permission")
+    @fsr.required_permissions("hello", ["edit-blog", "view-blogs"])
+    def permissions_test():
+        return "works"
+
+    @app.route("/any-permission")
+    @fsr.any_permission("hello", ["edit-blog", "delete-blog"])
+    def any_permission_test():
+        return "works"
+
     return app
 
 
@@ -58,3 +86,19 @@ def db_session(app_instance):
 def client(app_instance: Flask):
     with app_instance.test_client() as client:
         yield client
+
+
+@pytest.fixture
+def statements():
+    """
+    SQL statements executed by any engine during the test. Clear it before the
+    part of the test whose statements are counted.
+    """
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(Engine, "before_cursor_execute", count)
@@ -10,6 +10,7 @@ class User(db.Model, UserMixin):
 
 class Role(db.Model, RoleMixin):
     __tablename__ = "Role"
+    fsr_hierarchy = True
 
 
 class Permission(db.Model, PermissionMixin):
@@ -26,3 +27,11 @@ class UserRole(db.Model, UserRoleMixin):
 
 class RolePermission(db.Model, RolePermissionMixin):
     __tablename__ = "RolePermission"
+
+
+class RoleClosure(db.Model, RoleClosureMixin):
+    __tablename__ = "RoleClosure"
+
+
+class RBACVersion(db.Model, RBACVersionMixin):
+    __tablename__ = "RBACVersion"
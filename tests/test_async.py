@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("asgiref")
+pytest.importorskip("aiosqlite")
+
+from flask import Flask
+from flask_secure_roles import FlaskSecureRoles, core
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from .conftest import db
+from .models import User, Project, Role, UserRole
+
+
+@pytest.fixture(scope="module")
+def async_app(tmp_path_factory):
+    path = tmp_path_factory.mktemp("async") / "fsr.db"
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    fsr = FlaskSecureRoles(app)
+
+    @app.route("/async-role")
+    @fsr.required_roles("async", ["admin"])
+    async def async_roles_test():
+        return "works"
+
+    @app.route("/async-forbid-role")
+    @fsr.forbid_roles("async", ["admin"])
+    async def async_forbid_roles_test():
+        return "works"
+
+    with app.app_context():
+        db.create_all()
+        user = User(name="async")
+        project = Project(fsr_project_name="async")
+        db.session.add_all([user, project])
+        db.session.commit()
+        role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+        db.session.add(role)
+        db.session.commit()
+        db.session.add(
+            UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id)
+        )
+        db.session.commit()
+
+        @fsr.guest_user_loader
+        def guest_loader():
+            return user
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        yield app, fsr, user, engine
+        db.session.remove()
+
+
+def test_async_views(async_app):
+    app, fsr, user, engine = async_app
+    client = app.test_client()
+    fsr.user_loader(user)
+
+    assert client.get("/async-role").data == b"works"
+    assert client.get("/async-forbid-role").status_code == 401
+
+
+def test_async_session_loader(async_app, monkeypatch, statements):
+    app, fsr, user, engine = async_app
+    client = app.test_client()
+    fsr.async_session_loader(async_sessionmaker(engine))
+    fsr.user_loader(user)
+
+    def fail(user):
+        raise AssertionError("The blocking loader must not be used")
+
+    monkeypatch.setattr(core, "_build_snapshot", fail)
+
+    statements.clear()
+    resp = client.get("/async-role")
+
+    assert resp.data == b"works"
+    assert len(statements) == 1
+
+    with pytest.raises(TypeError):
+        fsr.async_session_loader("session")
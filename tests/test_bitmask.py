@@ -0,0 +1,19 @@
+from flask_secure_roles.bitmask import RoleBits
+
+
+def test_role_bits():
+    bits = RoleBits()
+
+    admin = bits.mask("hello", ["admin"])
+    editor = bits.mask("hello", ["editor"])
+    both = bits.mask("hello", ["editor", "admin"])
+
+    # Ids are dense and stable
+    assert admin == 0b01
+    assert editor == 0b10
+    assert both == admin | editor
+    assert bits.mask("hello", ["admin"]) == admin
+
+    # Every project numbers its roles on its own
+    assert bits.mask("other", ["editor"]) == 0b01
+    assert bits.mask("hello", []) == 0
@@ -0,0 +1,292 @@
+from flask_secure_roles import FlaskSecureRoles, Principal
+from flask_secure_roles.cache import MemoryCache, RedisCache
+from flask_secure_roles.errors import MisconfigurationError
+from flask import Flask
+import pytest
+from sqlalchemy.orm import scoped_session, Session
+from .models import User, Project, Role, UserRole, Permission, RolePermission
+
+
+def test_cache_lru_eviction():
+    cache = MemoryCache(maxsize=2, ttl=None)
+    cache.set("1", "a")
+    cache.set("2", "b")
+
+    # Touch "1" so that "2" becomes the least recently used entry
+    assert cache.get("1") == "a"
+    cache.set("3", "c")
+
+    assert cache.get("2") is None
+    assert cache.get("1") == "a"
+    assert cache.get("3") == "c"
+    assert len(cache) == 2
+
+
+def test_cache_ttl(monkeypatch):
+    from flask_secure_roles import cache as cache_module
+
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    cache = MemoryCache(maxsize=2, ttl=10)
+    cache.set("1", "a")
+    now[0] += 5
+    assert cache.get("1") == "a"
+    now[0] += 6
+    assert cache.get("1") is None
+    assert len(cache) == 0
+
+
+class FakeRedis:
+    """
+    Stand-in for `redis.Redis` implementing the commands used by RedisCache
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def get(self, name):
+        self.commands.append("GET")
+        return self.data.get(name)
+
+    def mget(self, keys):
+        self.commands.append("MGET")
+        return [self.data.get(key) for key in keys]
+
+    def set(self, name, value, ex=None):
+        self.commands.append("SET")
+        self.data[name] = value.encode("utf-8")
+
+    def delete(self, name):
+        self.commands.append("DEL")
+        self.data.pop(name, None)
+
+    def incr(self, name):
+        self.commands.append("INCR")
+        value = int(self.data.get(name, 0)) + 1
+        self.data[name] = str(value).encode("utf-8")
+        return value
+
+
+def test_memory_cache_generation():
+    cache = MemoryCache(maxsize=4, ttl=None)
+    cache.set("1", "a")
+    generation = cache.generation()
+
+    assert cache.bump_generation() == generation + 1
+    assert cache.get("1") is None
+
+    # Values computed before a bump are not served after it
+    cache.set("1", "stale", generation=generation)
+    assert cache.get("1") is None
+
+
+def test_redis_cache():
+    client = FakeRedis()
+    cache = RedisCache(client)
+    cache.set("1", {"hello": frozenset({"admin", "pop"})})
+    cache.set("2", {})
+
+    client.commands.clear()
+    assert cache.get_many(["1", "2", "3"]) == [
+        {"hello": frozenset({"admin", "pop"})},
+        {},
+        None,
+    ]
+    # The generation check shares the round trip with the entries
+    assert client.commands == ["MGET"]
+
+    # Another worker sharing the server revokes everything
+    RedisCache(client).bump_generation()
+    assert cache.get("1") is None
+
+    cache.set("1", {"hello": frozenset({"pop"})})
+    assert cache.get("1") == {"hello": frozenset({"pop"})}
+    cache.delete("1")
+    assert cache.get("1") is None
+
+
+def test_cache_invalidated_by_model_changes(
+    app_instance: Flask, db_session: scoped_session[Session]
+):
+    app_instance.config["FSR_CACHE"] = True
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    assert fsr.cache is not None
+    fsr.guest_user_loader(lambda: None)
+
+    user = User(name="cached")
+    project = Project(fsr_project_name="cached")
+    db_session.add_all([user, project])
+    db_session.commit()
+    role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    db_session.add(role)
+    db_session.commit()
+
+    def snapshot():
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._snapshot()
+
+    assert dict(snapshot()) == {}
+    assert fsr.cache.get(user.user_id()) is not None
+
+    # Granting a role drops the entry of that user
+    db_session.add(UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id))
+    db_session.commit()
+    assert fsr.cache.get(user.user_id()) is None
+    assert dict(snapshot()) == {"cached": frozenset({"admin"})}
+
+    # Renaming a role drops every entry
+    role.fsr_role_name = "owner"
+    db_session.commit()
+    assert len(fsr.cache) == 0
+    assert dict(snapshot()) == {"cached": frozenset({"owner"})}
+
+
+def test_cache_invalidated_after_commit(
+    app_instance: Flask, db_session: scoped_session[Session], monkeypatch
+):
+    from flask_secure_roles import core
+
+    app_instance.config["FSR_CACHE"] = True
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    fsr.guest_user_loader(lambda: None)
+
+    user = db_session.query(User).filter(User.name == "cached").first()
+    grant = db_session.query(UserRole).filter_by(fsr_user_id=user.fsr_user_id).one()
+
+    def snapshot():
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._snapshot()
+
+    committed = snapshot()
+    assert dict(committed) == {"cached": frozenset({"owner"})}
+
+    db_session.delete(grant)
+    db_session.flush()
+    assert fsr.cache.get(user.user_id()) is None
+    # Another request rebuilds the entry from the still committed grant before
+    # the deletion commits
+    with monkeypatch.context() as patch:
+        patch.setattr(core, "_build_snapshot", lambda user: committed)
+        assert dict(snapshot()) == {"cached": frozenset({"owner"})}
+    db_session.commit()
+    assert dict(snapshot()) == {}
+
+    db_session.add(
+        UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=grant.fsr_role_id)
+    )
+    db_session.commit()
+    assert dict(snapshot()) == {"cached": frozenset({"owner"})}
+
+
+def test_cache_invalidated_by_permission_rename(
+    app_instance: Flask, db_session: scoped_session[Session]
+):
+    app_instance.config["FSR_CACHE"] = True
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    fsr.guest_user_loader(lambda: None)
+
+    user = db_session.query(User).filter(User.name == "cached").first()
+    role = db_session.query(Role).filter(Role.fsr_role_name == "owner").first()
+    permission = Permission(fsr_permission_name="edit")
+    db_session.add(permission)
+    db_session.commit()
+    grant = RolePermission(
+        fsr_role_id=role.fsr_role_id,
+        fsr_permission_id=permission.fsr_permission_id,
+    )
+    db_session.add(grant)
+    db_session.commit()
+
+    def permissions():
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._permissions()
+
+    assert permissions() == {"cached": frozenset({"edit"})}
+    assert fsr.cache.get(user.user_id() + ":permissions") is not None
+
+    permission.fsr_permission_name = "write"
+    db_session.commit()
+    assert fsr.cache.get(user.user_id() + ":permissions") is None
+    assert permissions() == {"cached": frozenset({"write"})}
+    db_session.delete(grant)
+    db_session.commit()
+
+
+def test_shared_cache_backend(app_instance: Flask, db_session: scoped_session[Session]):
+    client = FakeRedis()
+    app_instance.config["FSR_CACHE"] = True
+    app_instance.config["FSR_CACHE_BACKEND"] = RedisCache(client)
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    app_instance.config["FSR_CACHE_BACKEND"] = "memory"
+    fsr.guest_user_loader(lambda: None)
+
+    user = db_session.query(User).filter(User.name == "cached").first()
+    role = db_session.query(Role).filter(Role.fsr_role_name == "owner").first()
+
+    def snapshot():
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._snapshot()
+
+    assert dict(snapshot()) == {"cached": frozenset({"owner"})}
+    assert fsr.cache.get(user.user_id()) == {"cached": frozenset({"owner"})}
+
+    # Role changes bump the shared generation
+    generation = fsr.cache.generation()
+    role.fsr_role_name = "viewer"
+    db_session.commit()
+    assert fsr.cache.generation() > generation
+    assert dict(snapshot()) == {"cached": frozenset({"viewer"})}
+
+
+def test_cache_warm_up(
+    app_instance: Flask, db_session: scoped_session[Session], statements
+):
+    app_instance.config["FSR_CACHE"] = True
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    fsr.guest_user_loader(lambda: None)
+
+    user = db_session.query(User).filter(User.name == "cached").first()
+    idle = User(name="idle")
+    db_session.add(idle)
+    db_session.commit()
+    user_ids = [user.fsr_user_id, idle.fsr_user_id]
+
+    statements.clear()
+    assert fsr.warm_up(user_ids) == 2
+    # One query for the roles and one for the permissions of every user
+    assert len(statements) == 2
+    statements.clear()
+    with app_instance.test_request_context():
+        fsr.user_loader(Principal(user.fsr_user_id))
+        assert dict(fsr._snapshot()) == {"cached": frozenset({"viewer"})}
+        assert dict(fsr._permissions()) == {}
+        fsr.user_loader(Principal(idle.fsr_user_id))
+        assert dict(fsr._snapshot()) == {}
+    assert statements == []
+
+    # In the background, for the users of the callback
+    fsr.cache.clear()
+    fsr.warm_up_loader(lambda: [idle.fsr_user_id])
+    fsr.start_warm_up(app_instance).join()
+    assert fsr.cache.get(idle.user_id()) == {}
+    assert fsr.cache.get(user.user_id()) is None
+
+    with pytest.raises(MisconfigurationError):
+        FlaskSecureRoles().warm_up(user_ids)
+    app_instance.config["FSR_WARM_UP"] = True
+    try:
+        with pytest.raises(MisconfigurationError):
+            FlaskSecureRoles(app_instance)
+    finally:
+        app_instance.config["FSR_WARM_UP"] = False
@@ -4,7 +4,7 @@ from flask import Flask
 from flask.testing import FlaskClient
 import pytest
 from sqlalchemy.orm import scoped_session, Session
-from .models import db, User, Project, Role, UserRole
+from .models import db, User, Project, Role, UserRole, Permission, RolePermission
 
 
 def test_extension_load(app_instance: Flask):
@@ -173,3 +173,166 @@ def test_mix_roles(
     resp = client.get("/mix-role")
 
     assert resp.status_code == 401
+
+
+def test_snapshot_shared_by_stacked_decorators(
+    app_instance: Flask,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    monkeypatch,
+):
+    from flask_secure_roles import core
+
+    real_user = db_session.query(User).filter(User.name == "john").first()
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    fsr.user_loader(real_user)
+
+    calls = []
+    build_snapshot = core._build_snapshot
+
+    def counting_build_snapshot(user):
+        calls.append(user)
+        return build_snapshot(user)
+
+    monkeypatch.setattr(core, "_build_snapshot", counting_build_snapshot)
+
+    # Three stacked decorators, one snapshot
+    resp = client.get("/stacked-role")
+    assert resp.status_code == 200
+    assert len(calls) == 1
+
+    # Every request builds its own snapshot
+    resp = client.get("/stacked-role")
+    assert resp.status_code == 200
+    assert len(calls) == 2
+
+
+def test_permissions(
+    app_instance: Flask, client: FlaskClient, db_session: scoped_session[Session]
+):
+    real_user = db_session.query(User).filter(User.name == "john").first()
+    role = db_session.query(Role).filter(Role.fsr_role_name == "admin").first()
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    fsr.user_loader(real_user)
+
+    resp = client.get("/permission")
+    assert resp.status_code == 401
+    resp = client.get("/any-permission")
+    assert resp.status_code == 401
+
+    # Grant `edit-blog` to the admin role
+    edit = Permission(fsr_permission_name="edit-blog")
+    view = Permission(fsr_permission_name="view-blogs")
+    db_session.add_all([edit, view])
+    db_session.commit()
+    db_session.add(
+        RolePermission(
+            fsr_role_id=role.fsr_role_id, fsr_permission_id=edit.fsr_permission_id
+        )
+    )
+    db_session.commit()
+
+    resp = client.get("/permission")
+    assert resp.status_code == 401
+    resp = client.get("/any-permission")
+    assert resp.status_code == 200
+
+    # Grant `view-blogs` as well
+    db_session.add(
+        RolePermission(
+            fsr_role_id=role.fsr_role_id, fsr_permission_id=view.fsr_permission_id
+        )
+    )
+    db_session.commit()
+
+    resp = client.get("/permission")
+    assert resp.status_code == 200
+    assert resp.data == b"works"
+
+    # The guest has no role in the project
+    fsr.user_loader(None)
+    resp = client.get("/any-permission")
+    assert resp.status_code == 401
+
+
+def test_policy(
+    app_instance: Flask, client: FlaskClient, db_session: scoped_session[Session]
+):
+    real_user = db_session.query(User).filter(User.name == "john").first()
+    project = (
+        db_session.query(Project).filter(Project.fsr_project_name == "hello").first()
+    )
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    fsr.user_loader(real_user)
+
+    resp = client.get("/policy")
+    assert resp.status_code == 200
+
+    # Suspend john
+    role = Role(fsr_role_name="suspended", fsr_project_id=project.fsr_project_id)
+    db_session.add(role)
+    db_session.commit()
+    db_session.add(
+        UserRole(fsr_user_id=real_user.fsr_user_id, fsr_role_id=role.fsr_role_id)
+    )
+    db_session.commit()
+
+    resp = client.get("/policy")
+    assert resp.status_code == 401
+
+    fsr.user_loader(None)
+    resp = client.get("/policy")
+    assert resp.status_code == 401
+
+
+def test_authorize_many(
+    app_instance: Flask,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    statements,
+):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    john = db_session.query(User).filter(User.name == "john").first()
+    guest = db_session.query(User).filter(User.name == "guest").first()
+    pop = Role(
+        fsr_role_name="pop",
+        fsr_project_id=db_session.query(Project).first().fsr_project_id,
+    )
+    jane = User(name="jane")
+    db_session.add_all([pop, jane])
+    db_session.commit()
+    db_session.add(UserRole(fsr_user_id=jane.fsr_user_id, fsr_role_id=pop.fsr_role_id))
+    db_session.commit()
+
+    ids = [john.fsr_user_id, jane.user_id(), guest.fsr_user_id]
+
+    statements.clear()
+    assert fsr.authorize_many(ids, "hello", ["admin"]) == {
+        john.fsr_user_id: True,
+        jane.user_id(): False,
+        guest.fsr_user_id: False,
+    }
+    assert len(statements) == 1
+
+    statements.clear()
+    assert fsr.authorize_many(ids, "hello", ["admin", "pop"], chunk_size=1) == {
+        john.fsr_user_id: False,
+        jane.user_id(): False,
+        guest.fsr_user_id: False,
+    }
+    assert len(statements) == 3
+
+    assert fsr.authorize_many(ids, "hello", ["admin", "pop"], mode="any") == {
+        john.fsr_user_id: True,
+        jane.user_id(): True,
+        guest.fsr_user_id: False,
+    }
+    # As with `forbid_roles`, users without any role in the project are refused
+    assert fsr.authorize_many(ids, "hello", ["admin"], mode="none") == {
+        john.fsr_user_id: False,
+        jane.user_id(): True,
+        guest.fsr_user_id: False,
+    }
+
+    with pytest.raises(ValueError):
+        fsr.authorize_many(ids, "hello", ["admin"], mode="some")
@@ -0,0 +1,74 @@
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy.orm import scoped_session, Session
+from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles.cache import _dump_index, _load_index
+from flask_secure_roles.tokens import dump_claims, load_claims
+from .models import User, Project, Role, UserRole, Permission, RolePermission
+
+
+def test_global_roles(
+    app_instance: Flask, client: FlaskClient, db_session: scoped_session[Session]
+):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    hello = Project(fsr_project_name="hello")
+    other = Project(fsr_project_name="other")
+    operator = User(name="operator")
+    admin = Role(fsr_role_name="admin")
+    edit = Permission(fsr_permission_name="edit-blog")
+    view = Permission(fsr_permission_name="view-blogs")
+    db_session.add_all([hello, other, operator, admin, edit, view])
+    db_session.commit()
+    db_session.add_all(
+        [
+            Role(fsr_role_name="pop", fsr_project_id=hello.fsr_project_id),
+            RolePermission(
+                fsr_role_id=admin.fsr_role_id, fsr_permission_id=edit.fsr_permission_id
+            ),
+            RolePermission(
+                fsr_role_id=admin.fsr_role_id, fsr_permission_id=view.fsr_permission_id
+            ),
+        ]
+    )
+    db_session.commit()
+
+    # Global roles are granted with no project
+    assert fsr.grant([operator], None, ["admin"]) == [(operator.fsr_user_id, "admin")]
+    db_session.commit()
+    fsr.guest_user_loader(lambda: operator)
+    fsr.user_loader(operator)
+
+    # A single row authorizes the operator in every project
+    assert client.get("/role").data == b"works"
+    assert client.get("/any-role").data == b"works"
+    assert client.get("/forbid-role").status_code == 401
+    assert client.get("/policy").data == b"works"
+    assert client.get("/permission").data == b"works"
+    assert client.get("/any-permission").data == b"works"
+
+    assert operator.project_roles() == [(None, "admin")]
+    assert operator.projects() == operator.projects(eager=True) == []
+    assert operator.roles(project_name="other") == ["admin"]
+    assert operator.roles(project_name="other", eager=True) == ["admin"]
+    assert admin.has_permission("other", "edit-blog")
+    assert fsr.authorize_many([operator.fsr_user_id], "other", ["admin"]) == {
+        operator.fsr_user_id: True
+    }
+
+    assert fsr.sync_roles(operator, None, []) == (
+        [],
+        [(operator.fsr_user_id, "admin")],
+    )
+    db_session.commit()
+    assert operator.roles(project_name="other", eager=True) == []
+
+
+def test_global_roles_serialization():
+    snapshot = {None: frozenset({"admin"}), "hello": frozenset({"pop"})}
+
+    assert _load_index(_dump_index(snapshot)) == snapshot
+    # Entries written before global roles existed are still readable
+    assert _load_index('{"hello":["pop"]}') == {"hello": frozenset({"pop"})}
+
+    token = dump_claims("secret", "1", 0, snapshot)
+    assert load_claims("secret", token).snapshot == snapshot
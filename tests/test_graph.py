@@ -0,0 +1,121 @@
+import os
+import stat
+from flask import Flask
+from flask.testing import FlaskClient
+import pytest
+from sqlalchemy.orm import scoped_session, Session
+from flask_secure_roles import FlaskSecureRoles, Principal
+from flask_secure_roles.core import _build_permissions, _build_snapshot
+from flask_secure_roles.graph import RoleGraph
+from .models import User, Project, Role, UserRole, Permission, RolePermission
+
+
+@pytest.fixture(scope="module")
+def graph_users(db_session: scoped_session[Session]):
+    project = Project(fsr_project_name="hello")
+    edit = Permission(fsr_permission_name="edit-blog")
+    view = Permission(fsr_permission_name="view-blogs")
+    db_session.add_all([project, edit, view])
+    db_session.commit()
+    admin = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    db_session.add(admin)
+    db_session.commit()
+    editor = Role(fsr_role_name="editor", fsr_project=project, fsr_parent=admin)
+    operator = Role(fsr_role_name="operator")
+    alice, bob, carol = User(name="alice"), User(name="bob"), User(name="carol")
+    db_session.add_all([editor, operator, alice, bob, carol])
+    db_session.commit()
+    db_session.add_all(
+        [
+            UserRole(fsr_user_id=alice.fsr_user_id, fsr_role_id=admin.fsr_role_id),
+            UserRole(fsr_user_id=bob.fsr_user_id, fsr_role_id=editor.fsr_role_id),
+            UserRole(fsr_user_id=bob.fsr_user_id, fsr_role_id=operator.fsr_role_id),
+            RolePermission(
+                fsr_role_id=editor.fsr_role_id, fsr_permission_id=edit.fsr_permission_id
+            ),
+            RolePermission(
+                fsr_role_id=operator.fsr_role_id,
+                fsr_permission_id=view.fsr_permission_id,
+            ),
+        ]
+    )
+    db_session.commit()
+    return [alice, bob, carol]
+
+
+def test_export_graph(
+    app_instance: Flask,
+    db_session: scoped_session[Session],
+    graph_users,
+    tmp_path,
+):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    path = str(tmp_path / "rbac.graph")
+
+    result = app_instance.test_cli_runner().invoke(args=["fsr", "export-graph", path])
+    assert result.exit_code == 0, result.output
+    assert "2 users" in result.output
+    # Created with the mode of a plain `open`
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+
+    graph = RoleGraph(path, refresh_interval=None)
+    assert len(graph) == 2
+    # The export answers like the queries of the database
+    for user in graph_users:
+        principal = Principal(user.fsr_user_id)
+        assert graph.roles(user.fsr_user_id) == _build_snapshot(principal)
+        assert graph.permissions(user.fsr_user_id) == _build_permissions(principal)
+    assert graph.roles(graph_users[0].fsr_user_id) == {
+        "hello": frozenset({"admin", "editor"})
+    }
+    assert graph.roles(-1) == {}
+
+    # A new export is picked up by the processes mapping the file
+    carol = graph_users[2]
+    operator = db_session.query(Role).filter(Role.fsr_role_name == "operator").one()
+    db_session.add(
+        UserRole(fsr_user_id=carol.fsr_user_id, fsr_role_id=operator.fsr_role_id)
+    )
+    db_session.commit()
+    assert fsr.export_graph(path) == 3
+    assert graph.roles(carol.fsr_user_id) == {}
+    assert graph.refresh()
+    assert graph.roles(carol.fsr_user_id) == {None: frozenset({"operator"})}
+    assert not graph.refresh()
+
+    with open(path, "r+b") as f:
+        f.write(b"JUNK")
+    with pytest.raises(ValueError):
+        RoleGraph(path)
+
+
+def test_graph_mode(
+    app_instance: Flask,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    graph_users,
+    tmp_path,
+    statements,
+):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    path = str(tmp_path / "rbac.graph")
+    fsr.export_graph(path)
+    alice, bob = (user.fsr_user_id for user in graph_users[:2])
+    fsr.guest_user_loader(lambda: None)
+
+    fsr.graph = RoleGraph(path)
+    statements.clear()
+    try:
+        fsr.user_loader(alice)
+        assert client.get("/role").data == b"works"
+        assert client.get("/permission").status_code == 401
+        fsr.user_loader(bob)
+        assert client.get("/role").status_code == 401
+        # Permissions of global roles count in every project
+        assert client.get("/any-permission").data == b"works"
+        assert client.get("/permission").data == b"works"
+        assert statements == []
+    finally:
+        fsr.graph = None
@@ -0,0 +1,159 @@
+import pytest
+from flask import Flask
+from sqlalchemy import select
+from sqlalchemy.orm import DeclarativeBase, scoped_session, Session
+from flask_secure_roles import RoleMixin
+from flask_secure_roles.hierarchy import rebuild_role_closure
+from .models import (
+    User,
+    Project,
+    Role,
+    UserRole,
+    Permission,
+    RolePermission,
+    RoleClosure,
+)
+
+
+def closure(session):
+    return set(
+        session.execute(
+            select(
+                RoleClosure.fsr_ancestor_id,
+                RoleClosure.fsr_descendant_id,
+                RoleClosure.fsr_depth,
+            )
+        )
+    )
+
+
+@pytest.fixture(scope="module")
+def tree(db_session: scoped_session[Session]):
+    project = Project(fsr_project_name="tree")
+    db_session.add(project)
+    db_session.commit()
+    admin = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    editor = Role(fsr_role_name="editor", fsr_project=project, fsr_parent=admin)
+    viewer = Role(fsr_role_name="viewer", fsr_project=project, fsr_parent=editor)
+    user = User(name="tree")
+    db_session.add_all([admin, editor, viewer, user])
+    db_session.commit()
+    db_session.add(
+        UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=admin.fsr_role_id)
+    )
+    db_session.commit()
+    return user, admin, editor, viewer
+
+
+def test_closure_maintained(db_session: scoped_session[Session], tree):
+    user, admin, editor, viewer = tree
+    a, e, v = admin.fsr_role_id, editor.fsr_role_id, viewer.fsr_role_id
+
+    assert closure(db_session) == {(a, e, 1), (a, v, 2), (e, v, 1)}
+    assert [role.name() for role in admin.implied_roles()] == ["editor", "viewer"]
+
+    # Move viewer right below admin
+    viewer.fsr_parent = admin
+    db_session.commit()
+    assert closure(db_session) == {(a, e, 1), (a, v, 1)}
+
+    # Move editor, now a leaf, below viewer
+    editor.fsr_parent = viewer
+    db_session.commit()
+    assert closure(db_session) == {(a, v, 1), (a, e, 2), (v, e, 1)}
+
+    # Restore admin -> editor -> viewer
+    editor.fsr_parent = admin
+    db_session.commit()
+    viewer.fsr_parent = editor
+    db_session.commit()
+    assert closure(db_session) == {(a, e, 1), (a, v, 2), (e, v, 1)}
+    assert rebuild_role_closure(db_session) == 3
+    db_session.commit()
+    assert closure(db_session) == {(a, e, 1), (a, v, 2), (e, v, 1)}
+
+
+def test_hierarchy_rejects_cycles(db_session: scoped_session[Session], tree):
+    user, admin, editor, viewer = tree
+
+    admin.fsr_parent = viewer
+    with pytest.raises(ValueError, match="cycle"):
+        db_session.commit()
+    db_session.rollback()
+
+    other = Project(fsr_project_name="other-tree")
+    db_session.add(other)
+    db_session.commit()
+    db_session.add(Role(fsr_role_name="viewer", fsr_project=other, fsr_parent=admin))
+    with pytest.raises(ValueError, match="same project"):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_implied_roles(
+    app_instance: Flask, db_session: scoped_session[Session], tree, statements
+):
+    user, admin, editor, viewer = tree
+    permission = Permission(fsr_permission_name="read")
+    db_session.add(permission)
+    db_session.commit()
+    db_session.add(
+        RolePermission(
+            fsr_role_id=viewer.fsr_role_id,
+            fsr_permission_id=permission.fsr_permission_id,
+        )
+    )
+    db_session.commit()
+    db_session.refresh(user)
+
+    statements.clear()
+    pairs = user.project_roles()
+
+    assert sorted(pairs) == [("tree", "admin"), ("tree", "editor"), ("tree", "viewer")]
+    assert len(statements) == 1
+
+    # The lazy path looks up the implied roles of every held role at once
+    held = UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=editor.fsr_role_id)
+    db_session.add(held)
+    db_session.commit()
+    db_session.refresh(user)
+    statements.clear()
+    assert sorted(user.roles(project_name="tree")) == ["admin", "editor", "viewer"]
+    assert len([s for s in statements if '"RoleClosure"' in s]) == 1
+    assert sorted(user.roles(project_name="tree", eager=True)) == [
+        "admin",
+        "editor",
+        "viewer",
+    ]
+    assert user.project_permissions() == [("tree", "read")]
+
+    fsr = app_instance.extensions["flask_secure_roles"]
+    assert fsr.authorize_many([user.fsr_user_id], "tree", ["admin", "viewer"]) == {
+        user.fsr_user_id: True
+    }
+    db_session.delete(held)
+    db_session.commit()
+
+
+def test_hierarchy_opt_in():
+    class Base(DeclarativeBase):
+        pass
+
+    class FlatRole(Base, RoleMixin):
+        __tablename__ = "FlatRole"
+
+    assert "fsr_parent_id" not in FlatRole.__table__.c
+    assert [index.name for index in FlatRole.__table__.indexes] == [
+        "ix_FlatRole_fsr_project_id"
+    ]
+    assert "fsr_parent_id" in Role.__table__.c
+
+
+def test_role_delete_detaches_children(db_session: scoped_session[Session], tree):
+    user, admin, editor, viewer = tree
+    db_session.delete(editor)
+    db_session.commit()
+
+    assert viewer.fsr_parent_id is None
+    assert closure(db_session) == set()
+    assert sorted(user.roles(project_name="tree", eager=True)) == ["admin"]
@@ -0,0 +1,111 @@
+import pytest
+from flask import Flask
+from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles.metrics import PrometheusCollector
+from flask_secure_roles.signals import _measure, _statements, authorization_checked
+from .conftest import db
+from .models import User, Project, Role, UserRole
+
+
+@pytest.fixture(scope="module")
+def metrics_app():
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    db.init_app(app)
+    fsr = FlaskSecureRoles(app)
+    collector = PrometheusCollector(app)
+
+    @app.route("/role")
+    @fsr.required_roles("metrics", ["admin"])
+    def roles_test():
+        return "works"
+
+    @app.route("/forbid-role")
+    @fsr.forbid_roles("metrics", ["admin"])
+    def forbid_roles_test():
+        return "works"
+
+    @app.route("/stacked-role")
+    @fsr.any_role("metrics", ["admin"])
+    @fsr.required_roles("metrics", ["admin"])
+    def stacked_roles_test():
+        return "works"
+
+    with app.app_context():
+        db.create_all()
+        user = User(name="metrics")
+        project = Project(fsr_project_name="metrics")
+        db.session.add_all([user, project])
+        db.session.commit()
+        role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+        db.session.add(role)
+        db.session.commit()
+        db.session.add(
+            UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id)
+        )
+        db.session.commit()
+        fsr.guest_user_loader(lambda: user)
+        fsr.user_loader(user)
+        yield app, collector
+        collector.disconnect()
+        db.session.remove()
+
+
+def test_authorization_checked_signal(metrics_app):
+    app, collector = metrics_app
+    client = app.test_client()
+    events = []
+
+    def receiver(sender, **kwargs):
+        events.append(kwargs)
+
+    with authorization_checked.connected_to(receiver):
+        assert client.get("/role").data == b"works"
+        assert client.get("/forbid-role").status_code == 401
+        assert client.get("/stacked-role").data == b"works"
+
+    assert [
+        (e["check"], e["project"], e["endpoint"], e["allowed"]) for e in events
+    ] == [
+        ("required_roles", "metrics", "roles_test", True),
+        ("forbid_roles", "metrics", "forbid_roles_test", False),
+        ("any_role", "metrics", "stacked_roles_test", True),
+        ("required_roles", "metrics", "stacked_roles_test", True),
+    ]
+    assert all(e["queries"] >= 1 and not e["cached"] for e in events[:3])
+    # The inner check of a stack reads the snapshot built by the outer one
+    assert events[3]["queries"] == 0 and events[3]["cached"]
+    assert all(e["elapsed"] >= 0 for e in events)
+
+
+def test_measurement_reset_on_error(metrics_app):
+    app, _ = metrics_app
+
+    def failing():
+        raise RuntimeError("broken check")
+
+    with app.test_request_context("/role"):
+        with pytest.raises(RuntimeError):
+            _measure("required_roles", "metrics", failing)
+        # Statements of the request are no longer counted for the check
+        assert _statements.get() is None
+
+
+def test_prometheus_collector(metrics_app):
+    app, collector = metrics_app
+    client = app.test_client()
+    client.get("/role")
+
+    text = client.get("/metrics").get_data(as_text=True)
+    labels = 'check="required_roles",project="metrics",endpoint="roles_test"'
+
+    assert "# TYPE fsr_authorization_checks_total counter" in text
+    assert f'fsr_authorization_checks_total{{{labels},decision="allowed"}} 2' in text
+    assert f'fsr_authorization_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"fsr_authorization_duration_seconds_count{{{labels}}} 2" in text
+    assert f"fsr_authorization_cached_total{{{labels}}} 0" in text
+    assert (
+        'fsr_authorization_checks_total{check="forbid_roles",project="metrics",'
+        'endpoint="forbid_roles_test",decision="denied"} 1'
+    ) in text
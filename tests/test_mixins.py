@@ -182,3 +182,171 @@ def test_rolemixin_has_permission(db_session: scoped_session[Session]):
     assert not retrieved_role.has_permission("not-project", retrieved_permission.name())
 
     assert not retrieved_role.has_permission(retrieved_project.name(), "not-permission")
+
+
+def test_usermixin_project_permissions(db_session: scoped_session[Session]):
+    retrieved_user = db_session.query(User).first()
+
+    assert sorted(retrieved_user.project_permissions()) == [
+        ("hello", "edit-blog"),
+        ("hello", "view-blogs"),
+    ]
+
+
+def test_usermixin_eager_roles_query_count(
+    db_session: scoped_session[Session], statements
+):
+    project = Project(fsr_project_name="eager")
+    few = User()
+    many = User()
+    db_session.add_all([project, few, many])
+    db_session.commit()
+
+    roles = [
+        Role(fsr_role_name=f"role-{i}", fsr_project_id=project.fsr_project_id)
+        for i in range(50)
+    ]
+    db_session.add_all(roles)
+    db_session.commit()
+
+    db_session.add(
+        UserRole(fsr_user_id=few.fsr_user_id, fsr_role_id=roles[0].fsr_role_id)
+    )
+    db_session.add_all(
+        UserRole(fsr_user_id=many.fsr_user_id, fsr_role_id=role.fsr_role_id)
+        for role in roles
+    )
+    db_session.commit()
+
+    def queries(user, method, **kwargs):
+        # Load the user first so that only the role lookup is counted
+        user = db_session.get(User, user.fsr_user_id)
+        db_session.expire_all()
+        user.fsr_user_id
+        statements.clear()
+        result = getattr(user, method)(**kwargs)
+        return result, len(statements)
+
+    few_pairs, few_count = queries(few, "project_roles")
+    many_pairs, many_count = queries(many, "project_roles")
+    assert few_pairs == [("eager", "role-0")]
+    assert len(many_pairs) == 50
+    assert few_count == many_count == 1
+
+    many_roles, many_count = queries(many, "roles", project_name="eager", eager=True)
+    assert sorted(many_roles) == sorted(role.name() for role in roles)
+    assert many_count == 1
+
+    many_projects, many_count = queries(many, "projects", eager=True)
+    # Listed once however many roles the user has in the project
+    assert many_projects == ["eager"]
+    assert many_count == 1
+
+
+def test_reverse_lookups(db_session: scoped_session[Session]):
+    project: Project = (
+        db_session.query(Project).filter(Project.fsr_project_name == "eager").first()
+    )
+    first_role: Role = (
+        db_session.query(Role).filter(Role.fsr_role_name == "role-0").first()
+    )
+    holders = [user_role.fsr_user for user_role in first_role.fsr_users]
+    few, many = sorted(holders, key=lambda user: user.fsr_user_id)
+
+    # Every member appears once, whatever the number of roles held
+    assert project.members() == [few, many]
+    assert first_role.users() == [few, many]
+    assert Role.users_with_role(db_session, "eager", "role-1") == [many]
+    assert Role.users_with_role(db_session, "hello", "role-1") == []
+
+    # Keyset pagination
+    page = project.members(limit=1)
+    assert page == [few]
+    assert project.members(after=page[-1].fsr_user_id, limit=1) == [many]
+    assert project.members(after=many.fsr_user_id) == []
+
+    # Streaming
+    assert list(project.members(stream=True, batch_size=1)) == [few, many]
+
+
+def test_secondary_indexes(db_session: scoped_session[Session]):
+    from sqlalchemy import inspect
+
+    inspector = inspect(db_session.get_bind())
+
+    def indexes(table):
+        return {
+            index["name"]: index["column_names"]
+            for index in inspector.get_indexes(table)
+        }
+
+    assert indexes("UserRole")["ix_UserRole_fsr_user_id"] == [
+        "fsr_user_id",
+        "fsr_role_id",
+    ]
+    assert indexes("Role")["ix_Role_fsr_project_id"] == [
+        "fsr_project_id",
+        "fsr_role_name",
+    ]
+    assert indexes("RolePermission")["ix_RolePermission_fsr_permission_id"] == [
+        "fsr_permission_id",
+        "fsr_role_id",
+    ]
+
+
+def test_usermixin_roles_interned_project_id(
+    db_session: scoped_session[Session], statements
+):
+    from flask_secure_roles.models import _project_ids
+
+    project = (
+        db_session.query(Project).filter(Project.fsr_project_name == "eager").first()
+    )
+    # The user holding all the roles of the project
+    user = db_session.query(Role).filter(Role.fsr_role_name == "role-49").first()
+    user = user.users()[0]
+    expected = sorted(user.roles(project_name="eager", eager=True))
+    assert _project_ids.cached(db_session, "eager") == project.fsr_project_id
+
+    statements.clear()
+    # Filtered on the interned ID, without touching the Project table
+    assert sorted(user.roles(project_name="eager", eager=True)) == expected
+    assert sorted(user.roles(project_name="eager")) == expected
+    assert not any('"Project"' in statement for statement in statements)
+
+    project.fsr_project_name = "renamed"
+    db_session.commit()
+    assert _project_ids.cached(db_session, "eager") is None
+    assert user.roles(project_name="eager") == []
+    assert sorted(user.roles(project_name="renamed")) == expected
+    project.fsr_project_name = "eager"
+    db_session.commit()
+
+
+def test_project_ids_expire(db_session: scoped_session[Session], monkeypatch):
+    from flask_secure_roles import models
+
+    project_ids = models._ProjectIds(ttl=10)
+    project = (
+        db_session.query(Project).filter(Project.fsr_project_name == "eager").first()
+    )
+    now = [100.0]
+    monkeypatch.setattr(models.time, "monotonic", lambda: now[0])
+
+    assert project_ids.get(db_session, "eager") == project.fsr_project_id
+    now[0] += 5
+    assert project_ids.cached(db_session, "eager") == project.fsr_project_id
+    now[0] += 6
+    assert project_ids.cached(db_session, "eager") is None
+
+
+def test_usermixin_global_roles_unknown_project(db_session: scoped_session[Session]):
+    user = User(name="global")
+    role = Role(fsr_role_name="superadmin")
+    db_session.add_all([user, role])
+    db_session.commit()
+    db_session.add(UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id))
+    db_session.commit()
+
+    assert user.roles(project_name="newproj") == ["superadmin"]
+    assert user.roles(project_name="newproj", eager=True) == ["superadmin"]
@@ -0,0 +1,45 @@
+from flask_secure_roles.bitmask import RoleBits
+from flask_secure_roles.policy import Role, AllOf, AnyOf, Not
+import pytest
+
+
+def test_policy_expressions():
+    expr = (Role("A", "admin") | Role("A", "editor")) & ~Role("B", "suspended")
+
+    assert isinstance(expr, AllOf)
+    assert isinstance(expr.operands[0], AnyOf)
+    assert isinstance(expr.operands[1], Not)
+    assert repr(expr) == (
+        "((Role('A', 'admin') | Role('A', 'editor')) & ~Role('B', 'suspended'))"
+    )
+
+    # Operators of the same kind are flattened
+    assert len((Role("A", "x") | Role("A", "y") | Role("A", "z")).operands) == 3
+
+    with pytest.raises(TypeError):
+        Role("A", "admin") & "admin"
+
+
+def test_policy_evaluation():
+    bits = RoleBits()
+    check = (
+        (Role("A", "admin") | Role("A", "editor")) & ~Role("B", "suspended")
+    ).compile(bits)
+
+    def evaluate(roles):
+        asked = []
+
+        def mask_of(project):
+            asked.append(project)
+            if project not in roles:
+                return None
+            return bits.mask(project, roles[project])
+
+        return check(mask_of), asked
+
+    assert evaluate({"A": ["editor"]}) == (True, ["A", "A", "B"])
+    assert evaluate({"A": ["admin"], "B": ["suspended"]})[0] is False
+    assert evaluate({"A": ["viewer"], "B": ["member"]})[0] is False
+
+    # Evaluation stops at the first failing operand
+    assert evaluate({}) == (False, ["A", "A"])
@@ -0,0 +1,143 @@
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import delete
+from sqlalchemy.orm import scoped_session, Session
+from flask_secure_roles import FlaskSecureRoles, Principal, current_user
+from flask_secure_roles.cache import RedisCache, subscribe
+from .models import User, Project, Role, UserRole
+
+
+def test_principal():
+    principal = Principal("7")
+
+    assert principal.fsr_user_id == 7
+    assert principal.user_id() == "7"
+    assert principal == Principal(7)
+    assert hash(principal) == hash(Principal(7))
+    with pytest.raises(AttributeError):
+        principal.fsr_user_id = 8
+    with pytest.raises(ValueError):
+        Principal("guest")
+
+
+def test_identity_only_user_loading(
+    app_instance: Flask,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    statements,
+):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+
+    @app_instance.route("/whoami")
+    def whoami():
+        return current_user.name
+
+    user = User(name="identity")
+    project = Project(fsr_project_name="hello")
+    db_session.add_all([user, project])
+    db_session.commit()
+    admin = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    db_session.add(admin)
+    db_session.commit()
+    db_session.add(
+        UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=admin.fsr_role_id)
+    )
+    db_session.commit()
+    user_id = user.fsr_user_id
+    db_session.expunge_all()
+
+    fsr.guest_user_loader(lambda: None)
+    statements.clear()
+    for identity in (user_id, str(user_id), Principal(user_id)):
+        fsr.user_loader(identity)
+        statements.clear()
+        assert client.get("/role").data == b"works"
+        # The snapshot query, without fetching the user row
+        assert len(statements) == 1
+        assert '"User"' not in statements[0]
+
+    statements.clear()
+    assert client.get("/whoami").data == b"identity"
+    assert len(statements) == 1
+
+    loaded = []
+    fsr.user_object_loader(lambda user_id: loaded.append(user_id) or user)
+    fsr.user_loader(Principal(user_id))
+    assert client.get("/whoami").data == b"identity"
+    assert loaded == [user_id]
+
+    with pytest.raises(TypeError):
+        fsr.user_loader("guest")
+    with pytest.raises(TypeError):
+        fsr.user_object_loader("loader")
+
+
+def test_cached_guest(
+    app_instance: Flask,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    monkeypatch,
+    statements,
+):
+    from .test_cache import FakeRedis
+
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    redis = FakeRedis()
+    monkeypatch.setattr(fsr, "cache", RedisCache(redis))
+    subscribe(fsr)
+
+    guest = User(name="cached-guest")
+    db_session.add(guest)
+    db_session.commit()
+    admin = db_session.query(Role).filter(Role.fsr_role_name == "admin").first()
+    guest_id = guest.fsr_user_id
+
+    loaded = []
+    fsr.guest_user_loader(lambda: loaded.append(guest_id) or guest_id)
+    statements.clear()
+    fsr.user_loader(None)
+    assert client.get("/role").status_code == 401
+    statements.clear()
+    for _ in range(3):
+        fsr.user_loader(None)
+        assert client.get("/role").status_code == 401
+    # The guest is resolved once per process, its snapshot is cached
+    assert statements == []
+    assert loaded == [guest_id]
+
+    # A role change of the guest refreshes its snapshot
+    grant = UserRole(fsr_user_id=guest_id, fsr_role_id=admin.fsr_role_id)
+    db_session.add(grant)
+    db_session.commit()
+    fsr.user_loader(None)
+    assert client.get("/role").data == b"works"
+    assert loaded == [guest_id]
+
+    # And so does a revocation made by another worker sharing the cache
+    db_session.execute(
+        delete(UserRole).where(
+            UserRole.fsr_user_id == guest_id,
+            UserRole.fsr_role_id == admin.fsr_role_id,
+        )
+    )
+    db_session.commit()
+    db_session.expunge(grant)
+    RedisCache(redis).delete(str(guest_id))
+    assert client.get("/role").status_code == 401
+
+    # The snapshot is not kept at all without `FSR_CACHE`
+    monkeypatch.setattr(fsr, "cache", None)
+    for _ in range(2):
+        statements.clear()
+        assert client.get("/role").status_code == 401
+        assert statements != []
+
+
+def test_transient_guest(app_instance: Flask, client: FlaskClient):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    # A guest object that was never added to the session has no user ID
+    fsr.guest_user_loader(lambda: User(name="transient-guest"))
+
+    fsr.user_loader(None)
+    assert client.get("/role").status_code == 401
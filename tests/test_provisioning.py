@@ -0,0 +1,113 @@
+from flask_secure_roles import FlaskSecureRoles
+from flask import Flask
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session, Session
+from .models import User, Project, Role, UserRole
+
+
+@pytest.fixture(scope="module")
+def org(app_instance: Flask, db_session: scoped_session[Session]):
+    app_instance.config["FSR_CACHE"] = True
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    fsr.guest_user_loader(lambda: None)
+
+    project = Project(fsr_project_name="org")
+    users = [User(name=f"member-{i}") for i in range(20)]
+    db_session.add(project)
+    db_session.add_all(users)
+    db_session.commit()
+    db_session.add_all(
+        Role(fsr_role_name=name, fsr_project_id=project.fsr_project_id)
+        for name in ("admin", "editor", "viewer")
+    )
+    db_session.commit()
+    return fsr, users
+
+
+def roles_of(db_session, user):
+    return sorted(
+        db_session.scalars(
+            select(Role.fsr_role_name)
+            .select_from(UserRole)
+            .join(Role, UserRole.fsr_role_id == Role.fsr_role_id)
+            .where(UserRole.fsr_user_id == user.fsr_user_id)
+        )
+    )
+
+
+def test_grant(org, db_session: scoped_session[Session], statements):
+    fsr, users = org
+
+    fsr.grant(users[:2], "org", ["viewer"])
+    db_session.commit()
+
+    user_ids = [user.fsr_user_id for user in users]
+    statements.clear()
+    added = fsr.grant(user_ids, "org", ["viewer", "editor"])
+    # The version bookkeeping of `RBACVersionMixin` is tested on its own
+    granting = [s for s in statements if '"RBACVersion"' not in s]
+    db_session.commit()
+
+    # Only the missing pairs are reported
+    assert len(added) == 38
+    assert (users[0].fsr_user_id, "viewer") not in added
+    assert (users[0].fsr_user_id, "editor") in added
+    # Role lookup, existing pairs and one batched insert
+    assert len(granting) == 3
+
+    assert roles_of(db_session, users[5]) == ["editor", "viewer"]
+
+    with pytest.raises(ValueError, match="Unknown roles in project 'org': owner"):
+        fsr.grant(users, "org", ["owner"])
+
+
+def test_grant_concurrent(org, db_session: scoped_session[Session], monkeypatch):
+    from flask_secure_roles import provisioning
+
+    fsr, users = org
+    # Pairs granted by a concurrent transaction after they were looked up
+    monkeypatch.setattr(provisioning, "_existing", lambda *args: set())
+
+    added = fsr.grant(users[:3], "org", ["viewer", "admin"])
+    db_session.commit()
+
+    assert sorted(added) == sorted((user.fsr_user_id, "admin") for user in users[:3])
+    monkeypatch.undo()
+    fsr.revoke(users[:3], "org", ["admin"])
+    db_session.commit()
+
+
+def test_revoke(org, db_session: scoped_session[Session]):
+    fsr, users = org
+
+    removed = fsr.revoke(users[:10], "org", ["editor", "admin"], chunk_size=3)
+    db_session.commit()
+
+    assert sorted(removed) == sorted(
+        (user.fsr_user_id, "editor") for user in users[:10]
+    )
+    assert roles_of(db_session, users[0]) == ["viewer"]
+    assert roles_of(db_session, users[10]) == ["editor", "viewer"]
+
+
+def test_sync_roles_invalidates_cache(
+    org, app_instance: Flask, db_session: scoped_session[Session]
+):
+    fsr, users = org
+    user = users[10]
+
+    def snapshot():
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._snapshot()
+
+    assert snapshot()["org"] == frozenset({"editor", "viewer"})
+
+    added, removed = fsr.sync_roles(user, "org", ["admin", "viewer"])
+    db_session.commit()
+
+    assert added == [(user.fsr_user_id, "admin")]
+    assert removed == [(user.fsr_user_id, "editor")]
+    assert snapshot()["org"] == frozenset({"admin", "viewer"})
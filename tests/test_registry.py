@@ -0,0 +1,78 @@
+from flask import Blueprint, Flask
+from flask.testing import FlaskClient
+import pytest
+from sqlalchemy.orm import scoped_session, Session
+from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles.policy import Role as RolePolicy
+from .models import User, Project, Role, UserRole
+
+
+@pytest.fixture(scope="module")
+def registry_fsr(app_instance: Flask):
+    fsr: FlaskSecureRoles = app_instance.extensions["flask_secure_roles"]
+    admin = Blueprint("admin", __name__)
+
+    @admin.route("/admin/index")
+    def index():
+        return "works"
+
+    @admin.route("/admin/settings")
+    def settings():
+        return "works"
+
+    @app_instance.route("/public")
+    def public():
+        return "works"
+
+    app_instance.register_blueprint(admin)
+    app_instance.before_request(fsr.enforce_policies)
+    fsr.register_policy(admin, RolePolicy("registry", "admin"))
+    fsr.register_policy("admin.settings", RolePolicy("registry", "owner"))
+    yield fsr
+    fsr.unregister_policy(admin)
+    fsr.unregister_policy("admin.settings")
+
+
+def test_policy_registry(
+    registry_fsr: FlaskSecureRoles,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+):
+    fsr = registry_fsr
+    user = User(name="registry")
+    project = Project(fsr_project_name="registry")
+    db_session.add_all([user, project])
+    db_session.commit()
+    admin = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    owner = Role(fsr_role_name="owner", fsr_project_id=project.fsr_project_id)
+    db_session.add_all([admin, owner])
+    db_session.commit()
+    fsr.guest_user_loader(lambda: None)
+    fsr.user_loader(user)
+
+    assert client.get("/public").data == b"works"
+    assert client.get("/admin/index").status_code == 401
+    assert client.get("/admin/settings").status_code == 401
+
+    db_session.add(
+        UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=admin.fsr_role_id)
+    )
+    db_session.commit()
+    fsr.user_loader(user)
+    assert client.get("/admin/index").data == b"works"
+    # The endpoint policy applies on top of the one of its blueprint
+    assert client.get("/admin/settings").status_code == 401
+
+    # Policies are replaced without redecorating the views
+    fsr.register_policy("admin.settings", RolePolicy("registry", "admin"))
+    assert client.get("/admin/settings").data == b"works"
+
+    assert fsr.dump_policies() == {
+        "endpoints": {"admin.settings": "Role('registry', 'admin')"},
+        "blueprints": {"admin": "Role('registry', 'admin')"},
+    }
+
+    with pytest.raises(TypeError):
+        fsr.register_policy("admin.index", "admin")
+    with pytest.raises(TypeError):
+        fsr.register_policy(None, RolePolicy("registry", "admin"))
@@ -0,0 +1,43 @@
+import pickle
+import pytest
+from flask_secure_roles import Snapshot
+from flask_secure_roles.bitmask import RoleBits
+
+
+def test_snapshot():
+    snapshot = Snapshot.from_pairs(
+        [("hello", "admin"), ("hello", "pop"), (None, "operator"), ("other", "pop")]
+    )
+
+    assert snapshot == {
+        "hello": frozenset({"admin", "pop"}),
+        None: frozenset({"operator"}),
+        "other": frozenset({"pop"}),
+    }
+    assert snapshot.get("missing") is None
+    with pytest.raises(AttributeError):
+        snapshot._entries = {}
+    # Names are interned, so snapshots of different users share them
+    other = Snapshot({"".join(["hel", "lo"]): ["".join(["ad", "min"])]})
+    assert next(iter(other)) is next(iter(snapshot))
+
+    bits = RoleBits()
+    assert snapshot.mask("hello", bits) == bits.mask(
+        "hello", ["admin", "pop", "operator"]
+    )
+    assert snapshot.mask("unknown", bits) == bits.mask("unknown", ["operator"])
+    assert Snapshot({"hello": ["admin"]}).mask("other", bits) is None
+
+
+def test_snapshot_serialization():
+    snapshot = Snapshot({"hello": ["admin", "pop"], None: ["operator"], "": []})
+
+    data = snapshot.to_bytes()
+    assert Snapshot.from_bytes(data) == snapshot
+    assert pickle.loads(pickle.dumps(snapshot)) == snapshot
+    assert Snapshot.from_bytes(Snapshot().to_bytes()) == {}
+
+    with pytest.raises(ValueError):
+        Snapshot.from_bytes(data[:-2])
+    with pytest.raises(ValueError):
+        Snapshot.from_bytes(b"\x00" + data[1:])
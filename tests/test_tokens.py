@@ -0,0 +1,157 @@
+from flask_secure_roles import FlaskSecureRoles, core
+from flask_secure_roles.cache import RedisCache
+from flask_secure_roles.errors import MisconfigurationError
+from flask_secure_roles.tokens import dump_claims, load_claims
+from flask import Flask
+from flask.testing import FlaskClient
+import pytest
+from sqlalchemy.orm import scoped_session, Session
+from .conftest import db
+from .models import User, Project, Role, UserRole
+
+
+@pytest.fixture(scope="module")
+def claims_fsr(app_instance: Flask):
+    app_instance.secret_key = "secret"
+    app_instance.config["FSR_TOKEN_CLAIMS"] = True
+    app_instance.config["FSR_RBAC_VERSION"] = True
+    app_instance.config["FSR_RBAC_VERSION_INTERVAL"] = 60000
+    fsr = FlaskSecureRoles(app_instance)
+
+    @app_instance.route("/claims")
+    @fsr.required_roles("claims", ["admin"])
+    def claims_test():
+        return "works"
+
+    yield fsr
+    app_instance.config["FSR_TOKEN_CLAIMS"] = False
+    app_instance.config["FSR_RBAC_VERSION"] = False
+    app_instance.config["FSR_RBAC_VERSION_INTERVAL"] = 1000
+
+
+def test_claims_roundtrip():
+    snapshot = {"hello": frozenset({"admin", "pop"})}
+    token = dump_claims("secret", "1", 3, snapshot)
+
+    claims = load_claims("secret", token)
+    assert claims.user_id == "1"
+    assert claims.role_version == 3
+    assert dict(claims.snapshot) == snapshot
+
+    assert load_claims("other-secret", token) is None
+    assert load_claims("secret", token[:-2]) is None
+
+
+def test_claims_require_shared_version():
+    app = Flask(__name__)
+    app.config["FSR_TOKEN_CLAIMS"] = True
+    with pytest.raises(MisconfigurationError):
+        FlaskSecureRoles(app)
+    app.config["FSR_CACHE"] = True
+    with pytest.raises(MisconfigurationError):
+        FlaskSecureRoles(app)
+
+
+def test_claims_token(
+    claims_fsr: FlaskSecureRoles,
+    client: FlaskClient,
+    db_session: scoped_session[Session],
+    monkeypatch,
+):
+    claims_fsr.guest_user_loader(lambda: None)
+    user = User(name="claims")
+    project = Project(fsr_project_name="claims")
+    db_session.add_all([user, project])
+    db_session.commit()
+    role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    db_session.add(role)
+    db_session.commit()
+    user_role = UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id)
+    db_session.add(user_role)
+    db_session.commit()
+
+    calls = []
+    build_snapshot = core._build_snapshot
+
+    def counting_build_snapshot(user):
+        calls.append(user)
+        return build_snapshot(user)
+
+    monkeypatch.setattr(core, "_build_snapshot", counting_build_snapshot)
+    claims_fsr.user_loader(user)
+
+    # The first request builds the snapshot and hands out the token
+    resp = client.get("/claims")
+    assert resp.status_code == 200
+    assert client.get_cookie("fsr_claims") is not None
+    assert len(calls) == 1
+
+    # Later requests are answered from the token
+    resp = client.get("/claims")
+    assert resp.status_code == 200
+    assert len(calls) == 1
+
+    # Revoking the role invalidates the token
+    db_session.delete(user_role)
+    db_session.commit()
+    resp = client.get("/claims")
+    assert resp.status_code == 401
+    assert len(calls) == 2
+
+    # A tampered token is ignored
+    client.set_cookie("fsr_claims", client.get_cookie("fsr_claims").value + "x")
+    resp = client.get("/claims")
+    assert resp.status_code == 401
+    assert len(calls) == 3
+
+
+def test_claims_version_read_before_snapshot(monkeypatch):
+    from .test_cache import FakeRedis
+
+    app = Flask(__name__)
+    app.secret_key = "secret"
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["FSR_TOKEN_CLAIMS"] = True
+    app.config["FSR_CACHE"] = True
+    app.config["FSR_CACHE_BACKEND"] = RedisCache(FakeRedis())
+    db.init_app(app)
+    fsr = FlaskSecureRoles(app)
+
+    @app.route("/claims")
+    @fsr.required_roles("claims", ["admin"])
+    def claims_test():
+        # Another worker revokes a role after the snapshot was built
+        fsr.cache.bump_generation()
+        return "works"
+
+    calls = []
+    build_snapshot = core._build_snapshot
+
+    def counting_build_snapshot(user):
+        calls.append(user)
+        return build_snapshot(user)
+
+    monkeypatch.setattr(core, "_build_snapshot", counting_build_snapshot)
+    with app.app_context():
+        db.create_all()
+        user = User(name="claims")
+        project = Project(fsr_project_name="claims")
+        db.session.add_all([user, project])
+        db.session.commit()
+        role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+        db.session.add(role)
+        db.session.commit()
+        db.session.add(
+            UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id)
+        )
+        db.session.commit()
+        fsr.guest_user_loader(lambda: None)
+        fsr.user_loader(user)
+
+        client = app.test_client()
+        assert client.get("/claims").status_code == 200
+        assert len(calls) == 1
+        # The token was signed with the version read before the change
+        assert client.get("/claims").status_code == 200
+        assert len(calls) == 2
+        db.session.remove()
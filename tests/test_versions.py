@@ -0,0 +1,109 @@
+from flask import Flask
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.orm import scoped_session, Session
+from flask_secure_roles import FlaskSecureRoles
+from flask_secure_roles.versions import changes_since, record
+from .models import User, Project, Role, UserRole, RBACVersion
+
+
+@pytest.fixture(scope="module")
+def versioned_fsr(app_instance: Flask):
+    app_instance.config["FSR_CACHE"] = True
+    app_instance.config["FSR_RBAC_VERSION"] = True
+    app_instance.config["FSR_RBAC_VERSION_INTERVAL"] = 0
+    fsr = FlaskSecureRoles(app_instance)
+    app_instance.config["FSR_CACHE"] = False
+    app_instance.config["FSR_RBAC_VERSION"] = False
+    fsr.guest_user_loader(lambda: None)
+    return fsr
+
+
+def test_versions_recorded(db_session: scoped_session[Session]):
+    user = User(name="versioned")
+    project = Project(fsr_project_name="versioned")
+    db_session.add_all([user, project])
+    db_session.commit()
+    role = Role(fsr_role_name="admin", fsr_project_id=project.fsr_project_id)
+    db_session.add(role)
+    db_session.commit()
+    version, _ = changes_since(db_session, None)
+
+    db_session.add(UserRole(fsr_user_id=user.fsr_user_id, fsr_role_id=role.fsr_role_id))
+    db_session.commit()
+    version, changed = changes_since(db_session, version)
+    assert changed == {user.user_id()}
+    assert changes_since(db_session, version) == (version, set())
+
+    # Changes to roles, projects and permissions affect every user
+    role.fsr_role_name = "owner"
+    db_session.commit()
+    assert changes_since(db_session, version)[1] is None
+
+    # Nothing is recorded for a rolled back change
+    version, _ = changes_since(db_session, version)
+    role.fsr_role_name = "viewer"
+    db_session.flush()
+    db_session.rollback()
+    assert changes_since(db_session, version) == (version, set())
+
+
+def test_versions_polled(
+    app_instance: Flask,
+    versioned_fsr: FlaskSecureRoles,
+    db_session: scoped_session[Session],
+    statements,
+):
+    fsr = versioned_fsr
+    alice = db_session.query(User).filter(User.name == "versioned").one()
+    bob = User(name="other")
+    db_session.add(bob)
+    db_session.commit()
+
+    def snapshot(user):
+        with app_instance.test_request_context():
+            fsr.user_loader(user)
+            return fsr._snapshot()
+
+    with app_instance.test_request_context():
+        fsr._poll_versions()
+    snapshot(alice)
+    snapshot(bob)
+
+    statements.clear()
+    with app_instance.test_request_context():
+        fsr._poll_versions()
+    # A single primary key lookup while nothing changed
+    assert len(statements) == 1
+
+    # Another process changes the roles of bob
+    record(db_session, [bob.fsr_user_id])
+    db_session.commit()
+    with app_instance.test_request_context():
+        fsr._poll_versions()
+    assert fsr.cache.get(alice.user_id()) is not None
+    assert fsr.cache.get(bob.user_id()) is None
+
+    # And then a role
+    record(db_session, None)
+    db_session.commit()
+    app_instance.config["FSR_RBAC_VERSION_INTERVAL"] = 60000
+    with app_instance.test_request_context():
+        fsr._poll_versions()
+        assert fsr.cache.get(alice.user_id()) is None
+        snapshot(alice)
+        record(db_session, None)
+        db_session.commit()
+        # Not read again before the interval elapsed
+        fsr._poll_versions()
+        assert fsr.cache.get(alice.user_id()) is not None
+
+
+def test_versions_counter_created(db_session: scoped_session[Session]):
+    db_session.execute(delete(RBACVersion))
+    db_session.commit()
+    # The first change creates the counter, later ones move it
+    assert record(db_session, [1]) == 1
+    assert record(db_session, [1, 2]) == 2
+    db_session.commit()
+    assert changes_since(db_session, 1) == (2, {"1", "2"})